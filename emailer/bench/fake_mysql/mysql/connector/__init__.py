@@ -0,0 +1,147 @@
+"""
+sqlite3-backed stand-in for mysql.connector, used only by the emailer benchmark (see ../../../run_bench.py).
+Put emailer/bench/fake_mysql on PYTHONPATH and point BENCH_SQLITE_DB at a database seeded by run_bench.py.
+Only the connector API and MySQL-only SQL that pos-emailer.py actually uses are translated.
+"""
+import os
+import re
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+
+DB_PATH = os.environ.get("BENCH_SQLITE_DB", "bench.sqlite3")
+# Simulated network round-trip per statement, to make query-count regressions visible
+QUERY_LATENCY = float(os.environ.get("BENCH_DB_LATENCY_MS", "0")) / 1000
+
+Error = sqlite3.Error
+
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+
+_TRANSLATIONS = [
+    (re.compile(r"\bINSERT IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bON DUPLICATE KEY UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"\s+ON UPDATE CURRENT_TIMESTAMP", re.I), ""),
+    (re.compile(r"\bCREATE INDEX\b", re.I), "CREATE INDEX IF NOT EXISTS"),
+    (re.compile(r"^\s*EXPLAIN\b", re.I), "EXPLAIN QUERY PLAN"),
+    (re.compile(r"\bNOW\(\)\s*\+\s*INTERVAL\s+%s\s+SECOND\b", re.I), "datetime('now', 'localtime', printf('%+f seconds', %s))"),
+    (re.compile(r"\bNOW\(\)", re.I), "datetime('now', 'localtime')"),
+    (re.compile(r"%s"), "?"),
+]
+
+_PLAN_STEP = re.compile(r"^(SCAN|SEARCH) (\w+)(?: AS \w+)?(?: USING (?:COVERING )?(?:INDEX (\w+)|INTEGER PRIMARY KEY))?")
+
+def explain_rows(plan):
+    """Reshape sqlite's EXPLAIN QUERY PLAN output into MySQL-style EXPLAIN rows (table, type, key, rows, Extra)"""
+    rows = []
+    for _id, _parent, _notused, detail in plan:
+        step = _PLAN_STEP.match(detail)
+        if step:
+            kind, table, index = step.groups()
+            key = index or ("PRIMARY" if "PRIMARY KEY" in detail else None)
+            access = "ref" if kind == "SEARCH" else ("index" if key else "ALL")
+            rows.append({"table": table, "type": access, "key": key, "rows": None, "Extra": "Using index" if "COVERING" in detail else "", "parent": _parent})
+        elif detail.startswith("USE TEMP B-TREE") and rows:
+            # The sort belongs to the first table of the (sub)query it is listed under
+            owner = next((row for row in rows if row["parent"] == _parent), rows[-1])
+            owner["Extra"] = "; ".join(filter(None, [owner["Extra"], "Using filesort"]))
+    for row in rows:
+        row.pop("parent")
+    return rows
+
+def translate(sql):
+    for pattern, replacement in _TRANSLATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+class Cursor:
+    def __init__(self, conn, dictionary=False):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+        self._explain = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, params=()):
+        if QUERY_LATENCY:
+            time.sleep(QUERY_LATENCY)
+        self._explain = None
+        self._cursor.execute(translate(sql), tuple(params or ()))
+        if re.match(r"\s*EXPLAIN\b", sql, re.I):
+            self._explain = explain_rows(self._cursor.fetchall())
+
+    def executemany(self, sql, seq_params):
+        if QUERY_LATENCY:
+            time.sleep(QUERY_LATENCY)
+        self._cursor.executemany(translate(sql), [tuple(params) for params in seq_params])
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((col[0] for col in self._cursor.description), row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        if self._explain is not None:
+            rows, self._explain = self._explain, None
+            return rows if self._dictionary else [tuple(row.values()) for row in rows]
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._row(row) for row in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+class Connection:
+    def __init__(self, **kwargs):
+        if QUERY_LATENCY:
+            time.sleep(QUERY_LATENCY)
+        self._conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+        # MySQL functions the emailer uses that sqlite lacks
+        self._conn.create_function("MOD", 2, lambda a, b: None if a is None or b is None else a % b, deterministic=True)
+        self._conn.create_function("CRC32", 1, lambda v: None if v is None else zlib.crc32(str(v).encode()), deterministic=True)
+        self._open = True
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self._conn, dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def consume_results(self):
+        pass
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self._open:
+            raise Error("connection closed")
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        if self._open:
+            self._conn.close()
+            self._open = False
+
+def connect(**kwargs):
+    return Connection(**kwargs)
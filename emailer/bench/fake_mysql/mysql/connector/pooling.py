@@ -0,0 +1,37 @@
+"""
+Minimal mysql.connector.pooling for the benchmark stand-in: a fixed-size pool of sqlite connections
+whose close() returns the connection to the pool, like PooledMySQLConnection.
+"""
+import queue
+
+from . import Connection, Error
+
+class PoolError(Error):
+    pass
+
+class PooledConnection:
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool._queue.put(self._conn)
+            self._conn = None
+
+class MySQLConnectionPool:
+    def __init__(self, pool_name=None, pool_size=5, pool_reset_session=True, **kwargs):
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self._queue = queue.Queue(pool_size)
+        for _ in range(pool_size):
+            self._queue.put(Connection(**kwargs))
+
+    def get_connection(self):
+        try:
+            return PooledConnection(self, self._queue.get(block=False))
+        except queue.Empty:
+            raise PoolError("Failed getting connection; pool exhausted")
@@ -0,0 +1,295 @@
+"""
+Benchmark / load test for pos-emailer.py without the production database or mail relay.
+
+Seeds a SQLite stand-in (served through fake_mysql/mysql/connector.py) with synthetic POS_PlanOfStudy,
+POS_History and Faculty rows, runs the emailer jobs against a local SMTP sink with injected latency,
+and reports wall time, throughput and the emailer's own per-stage metrics (p50/p95/p99).
+Each run is appended to a JSON-lines results file tagged with the git revision, so optimizations
+can be compared across versions.
+
+    python3 emailer/bench/run_bench.py --plans 10000 --faculty 500 --smtp-latency-ms 20
+    python3 emailer/bench/run_bench.py --history 10
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from smtp_sink import SMTPSink
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+EMAILER = os.path.join(BENCH_DIR, "..", "pos-emailer.py")
+FAKE_MYSQL = os.path.join(BENCH_DIR, "fake_mysql")
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "bench-results.jsonl")
+
+SCHEMA = """
+    CREATE TABLE POS_PlanOfStudy (
+        pos_id INTEGER PRIMARY KEY,
+        pid VARCHAR(64) NOT NULL,
+        pos_type VARCHAR(32),
+        committee_chair VARCHAR(64),
+        current_status INT NOT NULL
+    );
+    CREATE TABLE POS_History (
+        history_id INTEGER PRIMARY KEY,
+        plan_of_study INT NOT NULL,
+        history_status INT NOT NULL,
+        note TEXT,
+        changed_by VARCHAR(64),
+        date_changed DATETIME
+    );
+    CREATE TABLE Faculty (
+        pid VARCHAR(64) PRIMARY KEY,
+        email VARCHAR(255),
+        permissions INT NOT NULL
+    );
+"""
+
+# Rough production mix of current statuses
+STATUS_WEIGHTS = {1: 20, 2: 10, 3: 15, 4: 5, 5: 5, 6: 35, 99: 10}
+
+def seed(path, plans, faculty, admins, history_per_plan, seed_value=42):
+    """Create a synthetic database at path"""
+    rng = random.Random(seed_value)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    faculty_rows = [
+        (f"fac{i}", f"fac{i}@cs.vt.edu", 8 if i < admins else 2)
+        for i in range(faculty)
+    ]
+    conn.executemany("INSERT INTO Faculty VALUES (?, ?, ?)", faculty_rows)
+    advisors = [pid for pid, _, permissions in faculty_rows if permissions == 2] or ["fac0"]
+
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    now = datetime.now()
+    plan_rows = []
+    history_rows = []
+    history_id = 0
+    for pos_id in range(1, plans + 1):
+        status = rng.choices(statuses, weights)[0]
+        plan_rows.append((pos_id, f"stu{pos_id}", rng.choice(["MS", "MEng", "PhD"]), rng.choice(advisors), status))
+        # Earlier history rows walk through the workflow; the last one matches the current status
+        changed = now - timedelta(hours=rng.uniform(0, 72))
+        for step in range(history_per_plan):
+            history_id += 1
+            is_last = step == history_per_plan - 1
+            history_rows.append((
+                history_id, pos_id, status if is_last else min(step + 1, 5), None, "bench",
+                (changed - timedelta(hours=history_per_plan - step)).isoformat(" ")
+            ))
+    conn.executemany("INSERT INTO POS_PlanOfStudy VALUES (?, ?, ?, ?, ?)", plan_rows)
+    conn.executemany("INSERT INTO POS_History VALUES (?, ?, ?, ?, ?, ?)", history_rows)
+    conn.commit()
+    conn.close()
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def emailer_env(db_path, sink, args, metrics_path, extra):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": FAKE_MYSQL + os.pathsep + env.get("PYTHONPATH", ""),
+        "BENCH_SQLITE_DB": db_path,
+        "BENCH_DB_LATENCY_MS": str(args.db_latency_ms),
+        "SMTP_SERVER": sink.host,
+        "SMTP_PORT": str(sink.port),
+        "SMTP_SSL": "0",
+        "MAIL_USER": "",
+        "LOG_LEVEL": args.log_level,
+        "METRICS_FILE": metrics_path,
+    })
+    env.update(extra)
+    return env
+
+def run_job(job, db_path, sink, args, extra):
+    """Run one emailer job in a fresh process; returns the result record"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        metrics_path = f.name
+    env = emailer_env(db_path, sink, args, metrics_path, extra)
+    sink.reset()
+    stdin = None
+    if job == "startup":
+        # Cold start: interpreter + module load + argument parsing, no DB or SMTP work
+        command = [sys.executable, EMAILER, "--help"]
+    elif job == "events":
+        command = [sys.executable, EMAILER, "--serve", *args.emailer_args]
+        conn = sqlite3.connect(db_path)
+        approved = [row[0] for row in conn.execute(
+            "SELECT pid FROM POS_PlanOfStudy WHERE current_status = 6 LIMIT ?", (args.events,)
+        )]
+        conn.close()
+        stdin = "".join(
+            json.dumps({"id": i, "function": "pos_approved_email", "args": [pid]}) + "\n"
+            for i, pid in enumerate(approved)
+        )
+    else:
+        env["job"] = job
+        command = [sys.executable, EMAILER, *args.emailer_args]
+
+    # --workers > 1: several sharded emailer processes against the same database, each with its own metrics file
+    workers = args.workers if job not in ("startup", "events") else 1
+    if workers > 1:
+        env.setdefault("EMAILER_SHARDS", str(workers))
+    metrics_paths = [metrics_path] + [f"{metrics_path}.{i}" for i in range(1, workers)]
+    start = time.perf_counter()
+    procs = [
+        subprocess.Popen(command, env={**env, "METRICS_FILE": path, "EMAILER_WORKER_ID": f"bench-{i}"},
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for i, path in enumerate(metrics_paths)
+    ]
+    outputs = [proc.communicate(stdin) for proc in procs]
+    wall = time.perf_counter() - start
+    exit_code = max(proc.returncode for proc in procs)
+    for proc, (stdout, stderr) in zip(procs, outputs):
+        if proc.returncode != 0:
+            print(stdout[-4000:], stderr[-4000:], sep="\n", file=sys.stderr)
+
+    metrics = {}
+    for path in metrics_paths:
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path) as f:
+                worker_metrics = json.load(f)
+            # Timers/counters from all workers are listed together; "worker" distinguishes them
+            for section in ("timers", "counters"):
+                for entry in worker_metrics.get(section, []):
+                    if workers > 1:
+                        entry["labels"]["worker"] = metrics_paths.index(path)
+                    metrics.setdefault(section, []).append(entry)
+        if os.path.exists(path):
+            os.unlink(path)
+    messages = sink.stats["messages"]
+    return {
+        "job": job,
+        "workers": workers,
+        "duplicates": sink.duplicates(),
+        "exit_code": exit_code,
+        "wall_seconds": wall,
+        "messages": messages,
+        "recipients": sink.stats["recipients"],
+        "smtp_connections": sink.stats["connections"],
+        "messages_per_second": messages / wall if wall else 0.0,
+        "timers": metrics.get("timers", []),
+        "counters": metrics.get("counters", []),
+    }
+
+def _timer_line(timer):
+    labels = ",".join(f"{k}={v}" for k, v in timer["labels"].items())
+    return (f"    {timer['name']:<14} {labels:<32} n={timer['count']:<6} total={timer['total_seconds']:.3f}s "
+            f"p50={timer.get('p50_seconds', 0) * 1000:.1f}ms p95={timer.get('p95_seconds', 0) * 1000:.1f}ms "
+            f"p99={timer.get('p99_seconds', 0) * 1000:.1f}ms")
+
+def report(job, runs):
+    walls = [run["wall_seconds"] for run in runs]
+    rates = [run["messages_per_second"] for run in runs]
+    print(f"\n== {job}: {len(runs)} run(s), {runs[-1]['workers']} worker(s), {runs[-1]['messages']} messages, "
+          f"{runs[-1]['duplicates']} duplicate(s), {runs[-1]['smtp_connections']} SMTP connection(s)")
+    print(f"  wall  median={statistics.median(walls):.3f}s min={min(walls):.3f}s max={max(walls):.3f}s")
+    print(f"  rate  median={statistics.median(rates):.1f} msg/s")
+    print("  stages (last run):")
+    for timer in runs[-1]["timers"]:
+        print(_timer_line(timer))
+
+def show_history(path, limit):
+    if not os.path.exists(path):
+        print(f"No results in {path}")
+        return
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    print(f"{'when':<20} {'rev':<10} {'label':<16} {'job':<12} {'plans':>7} {'wall(s)':>9} {'msgs':>6} {'msg/s':>8}")
+    for record in records[-limit:]:
+        for job, summary in record["summary"].items():
+            print(f"{record['timestamp']:<20} {record['revision']:<10} {record.get('label', ''):<16} {job:<12} "
+                  f"{record['params']['plans']:>7} {summary['median_wall_seconds']:>9.3f} "
+                  f"{summary['messages']:>6} {summary['median_messages_per_second']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pos-emailer.py against fake MySQL and SMTP backends")
+    parser.add_argument("--plans", type=int, default=10000)
+    parser.add_argument("--faculty", type=int, default=500)
+    parser.add_argument("--admins", type=int, default=10, help="faculty with permissions >= 8")
+    parser.add_argument("--history-per-plan", type=int, default=3)
+    parser.add_argument("--jobs", default="faculty,pos-student", help="comma list of faculty, pos-student, events, startup")
+    parser.add_argument("--events", type=int, default=200, help="events to stream for the events job")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="concurrent sharded emailer processes per batch job (sets EMAILER_SHARDS)")
+    parser.add_argument("--smtp-latency-ms", type=float, default=20.0)
+    parser.add_argument("--smtp-connect-latency-ms", type=float, default=50.0)
+    parser.add_argument("--db-latency-ms", type=float, default=0.5)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra emailer env, e.g. SMTP_CONCURRENCY=8")
+    parser.add_argument("--emailer-args", default="", help="extra pos-emailer.py arguments, e.g. '--digest'")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--label", default="", help="free-form tag stored with the results")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSON-lines file results are appended to")
+    parser.add_argument("--no-record", action="store_true", help="do not append to the results file")
+    parser.add_argument("--history", type=int, metavar="N", help="show the last N recorded results and exit")
+    args = parser.parse_args()
+    args.emailer_args = args.emailer_args.split()
+
+    if args.history:
+        show_history(args.results, args.history)
+        return
+
+    extra = dict(item.split("=", 1) for item in args.env)
+    workdir = tempfile.mkdtemp(prefix="pos-emailer-bench-")
+    template_db = os.path.join(workdir, "seed.sqlite3")
+    print(f"Seeding {args.plans} plans, {args.faculty} faculty ({args.admins} admins)...")
+    seed(template_db, args.plans, args.faculty, args.admins, args.history_per_plan)
+
+    sink = SMTPSink(latency_ms=args.smtp_latency_ms, connect_latency_ms=args.smtp_connect_latency_ms).start()
+    results = {}
+    try:
+        for job in args.jobs.split(","):
+            runs = []
+            for _ in range(args.repeat):
+                # Fresh copy each run so the ledger and checkpoints start empty
+                db_path = os.path.join(workdir, "run.sqlite3")
+                shutil.copyfile(template_db, db_path)
+                runs.append(run_job(job, db_path, sink, args, extra))
+            report(job, runs)
+            results[job] = runs
+    finally:
+        sink.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.no_record:
+        return
+    record = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "label": args.label,
+        "params": {
+            "plans": args.plans, "faculty": args.faculty, "admins": args.admins,
+            "history_per_plan": args.history_per_plan, "smtp_latency_ms": args.smtp_latency_ms,
+            "smtp_connect_latency_ms": args.smtp_connect_latency_ms, "db_latency_ms": args.db_latency_ms,
+            "env": extra, "emailer_args": args.emailer_args, "workers": args.workers,
+        },
+        "summary": {
+            job: {
+                "median_wall_seconds": statistics.median(run["wall_seconds"] for run in runs),
+                "median_messages_per_second": statistics.median(run["messages_per_second"] for run in runs),
+                "messages": runs[-1]["messages"],
+            }
+            for job, runs in results.items()
+        },
+        "runs": results,
+    }
+    with open(args.results, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nRecorded results in {args.results}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Minimal local SMTP server that accepts and discards mail, for benchmarking and testing the emailer.
+Speaks just enough SMTP for smtplib (EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT) and can
+inject latency per connection and per message to imitate a remote relay.
+
+    python3 smtp_sink.py --port 2525 --latency-ms 20
+"""
+import argparse
+import socketserver
+import threading
+import time
+import zlib
+from collections import Counter
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        sink._count("connections")
+        time.sleep(sink.connect_latency)
+        self._reply("220 smtp-sink ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verb == "HELO":
+                self._reply("250 smtp-sink")
+            elif verb == "AUTH":
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[-1].strip(" <>").lower())
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                digest = 0
+                subject = None
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    size += len(data)
+                    if not data.lower().startswith(b"to:"):
+                        digest = zlib.crc32(data, digest)
+                    if subject is None and data[:8].lower() == b"subject:":
+                        subject = data[8:].decode(errors="replace").strip()
+                time.sleep(sink.message_latency)
+                sink._record(recipients, (subject, digest), size)
+                self._reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SMTPSink:
+    """Threaded SMTP sink; port=0 picks a free port (see .port after start())"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, connect_latency_ms=0.0):
+        self.message_latency = latency_ms / 1000
+        self.connect_latency = connect_latency_ms / 1000
+        self._lock = threading.Lock()
+        self.stats = {"connections": 0, "messages": 0, "recipients": 0, "bytes": 0}
+        # (recipient, (subject, body checksum)) -> deliveries, to spot duplicate notifications
+        self.deliveries = Counter()
+        self.first_message = None
+        self.last_message = None
+        self._server = _Server((host, port), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _record(self, recipients, content, size):
+        now = time.perf_counter()
+        with self._lock:
+            self.stats["messages"] += 1
+            self.stats["recipients"] += len(recipients)
+            self.deliveries.update((recipient, content) for recipient in recipients)
+            self.stats["bytes"] += size
+            self.first_message = self.first_message or now
+            self.last_message = now
+
+    def reset(self):
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+            self.deliveries.clear()
+            self.first_message = self.last_message = None
+
+    def duplicates(self):
+        """Deliveries beyond the first of an identical message to the same recipient"""
+        with self._lock:
+            return sum(count - 1 for count in self.deliveries.values() if count > 1)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local SMTP sink for emailer testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before acknowledging each message")
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0, help="delay before the greeting")
+    args = parser.parse_args()
+    sink = SMTPSink(args.host, args.port, args.latency_ms, args.connect_latency_ms)
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Stats: {sink.stats}")
@@ -1,65 +1,282 @@
+import time
+_STARTED = time.perf_counter()
 import os
-import smtplib
-import ssl
-import mysql.connector
 import sys
 import json
-import sys
 import argparse
-import traceback
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
-from datetime import datetime
+import logging
+import html
+import threading
+import zlib
+from datetime import datetime, timedelta
+from collections import namedtuple, deque
+from functools import lru_cache, wraps
+from contextlib import contextmanager
+from string import Template
+# smtplib/ssl, email.mime, mysql.connector, sqlite3 and concurrent.futures are imported where they are first
+# used, so event calls and --help don't pay for the paths they never touch
 
 # ============================================================================
-# INITIALIZATION - Logging start of script and loading configuration
+# LOGGING - LOG_LEVEL (DEBUG/INFO/WARNING/ERROR, default INFO) and LOG_FORMAT (text or json).
+# Per-plan / per-send lines are DEBUG with lazy %-formatting, so they cost almost nothing when disabled.
+# ============================================================================
+log = logging.getLogger("pos-emailer")
+
+class JSONLineFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+def configure_logging(level=None, fmt=None):
+    """(Re)configure the emailer logger - stdout, so the Node parent still captures it"""
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.environ.get("LOG_FORMAT", "text")
+    handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        handler.setFormatter(JSONLineFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+    log.handlers[:] = [handler]
+    log.setLevel(level)
+    log.propagate = False
+
 # ============================================================================
-print("=" * 80)
-print("[INIT] pos-emailer.py starting...")
-print(f"[INIT] Current environment variables: job={os.getenv('job', 'none')}")
-print("=" * 80)
+# METRICS - Per-stage timings (DB connect/query, render, SMTP connect/login/send) and message counters.
+# Logged as an end-of-run summary; --metrics-file / METRICS_FILE also writes JSON, or a Prometheus
+# textfile when the name ends in .prom.
+# ============================================================================
+class Metrics:
+    """Thread-safe timers and counters, keyed by name plus optional labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.timers = {}    # (name, labels) -> [count, total_seconds, max_seconds]
+        self.samples = {}   # (name, labels) -> most recent durations, for percentiles
+        self.counters = {}  # (name, labels) -> count
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            stat = self.timers.setdefault(key, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+            self.samples.setdefault(key, deque(maxlen=METRICS_MAX_SAMPLES)).append(seconds)
+
+    def percentiles(self, key, points=(50, 95, 99)):
+        """{p: seconds} over the retained samples for one timer (nearest-rank)"""
+        with self._lock:
+            ordered = sorted(self.samples.get(key, ()))
+        if not ordered:
+            return {}
+        return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
 
+    def incr(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def timed(self, name, **labels):
+        """Decorator form of timer()"""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    @staticmethod
+    def _label_str(labels):
+        return ",".join(f"{k}={v}" for k, v in labels)
+
+    def log_summary(self):
+        log.info("[METRICS] Run took %.3fs", time.time() - self.started)
+        for (name, labels), (count, total, slowest) in sorted(self.timers.items()):
+            pct = self.percentiles((name, labels))  # empty when METRICS_MAX_SAMPLES=0
+            log.info("[METRICS] %-14s %-32s n=%-5d total=%.3fs avg=%.1fms p50=%.1fms p95=%.1fms max=%.1fms",
+                     name, self._label_str(labels), count, total, total / count * 1000,
+                     pct.get(50, 0.0) * 1000, pct.get(95, 0.0) * 1000, slowest * 1000)
+        for (name, labels), count in sorted(self.counters.items()):
+            log.info("[METRICS] %-14s %-32s %d", name, self._label_str(labels), count)
+
+    def as_dict(self):
+        return {
+            "started": self.started,
+            "duration_seconds": time.time() - self.started,
+            "timers": [
+                {"name": name, "labels": dict(labels), "count": count, "total_seconds": total, "max_seconds": slowest,
+                 **{f"p{p}_seconds": v for p, v in self.percentiles((name, labels)).items()}}
+                for (name, labels), (count, total, slowest) in sorted(self.timers.items())
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": count}
+                for (name, labels), count in sorted(self.counters.items())
+            ],
+        }
+
+    def prometheus_text(self):
+        def series(metric, labels):
+            inner = ",".join(f'{k}="{v}"' for k, v in labels)
+            return f"pos_emailer_{metric}{{{inner}}}" if inner else f"pos_emailer_{metric}"
+        lines = [f"pos_emailer_last_run_timestamp_seconds {self.started:.0f}",
+                 f"pos_emailer_run_duration_seconds {time.time() - self.started:.6f}"]
+        for (name, labels), (count, total, slowest) in sorted(self.timers.items()):
+            lines.append(f"{series(name + '_seconds_count', labels)} {count}")
+            lines.append(f"{series(name + '_seconds_sum', labels)} {total:.6f}")
+            lines.append(f"{series(name + '_seconds_max', labels)} {slowest:.6f}")
+        for (name, labels), count in sorted(self.counters.items()):
+            lines.append(f"{series(name + '_total', labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write metrics atomically - Prometheus textfile for *.prom, JSON otherwise"""
+        content = self.prometheus_text() if path.endswith(".prom") else json.dumps(self.as_dict(), indent=2)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        log.info("[METRICS] Wrote %s", path)
+
+# Durations kept per timer for percentiles (0 = keep none; the summary then shows p50/p95 as 0)
+METRICS_MAX_SAMPLES = max(0, int(os.environ.get("METRICS_MAX_SAMPLES", "10000")))
+METRICS = Metrics()
+
+# ============================================================================
+# INITIALIZATION - Logging start of script and loading configuration
+# ============================================================================
 # smtp config (use same env names / pattern as `ugrad-emailer`)
-smtp_server = "smtp.cs.vt.edu"
-smtp_port = 465
-context = ssl.create_default_context()
-print(f"[INIT] SMTP configured: {smtp_server}:{smtp_port}")
+# SMTP_SERVER / SMTP_PORT / SMTP_SSL can point the emailer at a local smtpd stand-in for testing
+smtp_server = os.environ.get("SMTP_SERVER", "smtp.cs.vt.edu")
+smtp_port = int(os.environ.get("SMTP_PORT", "465"))
+smtp_use_ssl = os.environ.get("SMTP_SSL", "1") != "0"
+# Relays commonly cap messages per connection; reconnect before we hit it
+smtp_max_messages = int(os.environ.get("SMTP_MAX_MESSAGES_PER_CONN", "100"))
+# Set from --digest (or FACULTY_DIGEST=1): one faculty email per run covering every pending status
+FACULTY_DIGEST = os.environ.get("FACULTY_DIGEST", "0") == "1"
+# Parallel SMTP sessions used by the batch emailers
+SMTP_CONCURRENCY = int(os.environ.get("SMTP_CONCURRENCY", "4"))
+# Max RCPT TO per envelope for identical broadcast messages; 1 = one envelope per recipient (relay policy permitting)
+SMTP_MAX_RCPT = int(os.environ.get("SMTP_MAX_RCPT", "1"))
 
 # Prefer MAIL_USER / MAIL_PASSWORD for credentials (matches node/emailer and .env)
 mail_user = os.environ.get("MAIL_USER", "peongrad")
 mail_password = os.environ.get("MAIL_PASSWORD", "Hokies10!")
-print(f"[INIT] Mail user configured: {mail_user}")
-if not mail_password:
-    print("     [WARNING] MAIL_PASSWORD not set in environment; SMTP authentication will fail until configured.")
-else:
-    print("[INIT] MAIL_PASSWORD loaded from environment")
 
 DB_HOST = os.environ.get("dbhost", "saacs-database")
 DB_USER = os.environ.get("dbuser", "user-saacsdb")
 DB_PASS = os.environ.get("dbpass", "password25tts")
 DB_NAME = os.environ.get("dbname", "saacs-db")
 SITE_URL = os.environ.get("SITE_URL", "https://saacs.discovery.cs.vt.edu")
-print(f"[INIT] Database configured: host={DB_HOST}, user={DB_USER}, db={DB_NAME}")
-print(f"[INIT] Site URL: {SITE_URL}")
+# Student approval / rejection emails only go out for status changes newer than these windows; the student pass
+# walks every eligible plan in keyset pages of STUDENT_BATCH_SIZE, stopping early (and resuming next run) after
+# the time budget (0 = none)
+STUDENT_APPROVAL_WINDOW_HOURS = float(os.environ.get("STUDENT_APPROVAL_WINDOW_HOURS", "24"))
+STUDENT_REJECTION_WINDOW_HOURS = float(os.environ.get("STUDENT_REJECTION_WINDOW_HOURS", "24"))
+STUDENT_BATCH_SIZE = int(os.environ.get("STUDENT_BATCH_SIZE", "100"))
+STUDENT_TIME_BUDGET_SECONDS = float(os.environ.get("STUDENT_TIME_BUDGET_SECONDS", "0"))
 
-def get_db_conn():
-    """Establish database connection - logs attempt and errors"""
-    try:
-        print(f"[DB] Attempting connection to {DB_HOST}...")
-        conn = mysql.connector.connect(
+def log_config():
+    """Log the effective configuration at the start of a run"""
+    log.info("[INIT] pos-emailer.py starting...")
+    log.info("[INIT] Current environment variables: job=%s", os.getenv('job', 'none'))
+    log.info("[INIT] SMTP configured: %s:%s (ssl=%s, max_per_conn=%s)", smtp_server, smtp_port, smtp_use_ssl, smtp_max_messages)
+    log.info("[INIT] Mail user configured: %s", mail_user)
+    if not mail_password:
+        log.warning("[WARNING] MAIL_PASSWORD not set in environment; SMTP authentication will fail until configured.")
+    else:
+        log.info("[INIT] MAIL_PASSWORD loaded from environment")
+    log.info("[INIT] Database configured: host=%s, user=%s, db=%s", DB_HOST, DB_USER, DB_NAME)
+    log.info("[INIT] Site URL: %s", SITE_URL)
+
+@lru_cache(maxsize=1)
+def ssl_context():
+    """Default TLS context, built on the first SSL connection"""
+    import ssl
+    return ssl.create_default_context()
+
+# Connections come from a mysql.connector pool; DB_POOL_SIZE connections are opened when the pool is first used
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "1"))
+_db_pool = None
+
+def get_db_pool():
+    """Create the connection pool on first use"""
+    global _db_pool
+    if _db_pool is None:
+        log.debug("[DB] Creating pool of %s connection(s) to %s...", DB_POOL_SIZE, DB_HOST)
+        import mysql.connector.pooling
+        _db_pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name="pos-emailer",
+            pool_size=DB_POOL_SIZE,
+            pool_reset_session=False,
             host=DB_HOST,
             user=DB_USER,
             password=DB_PASS,
             database=DB_NAME
         )
-        print(f"[DB] Successfully connected to database {DB_NAME}")
+    return _db_pool
+
+def get_db_conn():
+    """Check a connection out of the pool (close() hands it back) - pinged so a stale one is reconnected"""
+    try:
+        log.debug("[DB] Checking out pooled connection to %s...", DB_HOST)
+        with METRICS.timer("db_connect"):
+            conn = get_db_pool().get_connection()
+            conn.ping(reconnect=True, attempts=2, delay=0)
+        log.debug("[DB] Successfully connected to database %s", DB_NAME)
         return conn
     except Exception as e:
-        print(f"[DB ERROR] Failed to connect to database: {e}")
-        print(f"[DB ERROR] Traceback: {traceback.format_exc()}")
+        log.error("[DB ERROR] Failed to connect to database: %s", e, exc_info=True)
         raise
 
+# One connection shared by both emailers, email lookups and event handlers; stays warm between events
+_shared_conn = None
+
+def get_shared_conn():
+    """Return the process-wide DB connection, reconnecting it if it went stale"""
+    global _shared_conn
+    try:
+        if _shared_conn is not None:
+            _shared_conn.ping(reconnect=True, attempts=2, delay=0)
+            return _shared_conn
+    except Exception as e:
+        log.debug("[DB] Shared connection went stale (%s), reconnecting", e)
+        close_shared_conn()
+    _shared_conn = get_db_conn()
+    ensure_ledger(_shared_conn)
+    return _shared_conn
+
+def close_shared_conn():
+    global _shared_conn
+    if _shared_conn is not None:
+        try:
+            _shared_conn.close()
+        except Exception as e:
+            log.debug("[DB] Error returning shared connection to the pool: %s", e)
+        _shared_conn = None
+
 def readable_timestamp(t):
     if not t:
         return "Unknown date"
@@ -71,76 +288,350 @@ def readable_timestamp(t):
     
     return t.strftime("%I:%M %p %b %d %Y")
 
-def get_user_email(pid):
-    """Retrieve email for a given PID from Faculty table, fallback to pid@vt.edu"""
+# pid -> (email, cached_at) for the run; EMAIL_CACHE_TTL (seconds) expires entries in resident mode, 0 = never
+_email_cache = {}
+EMAIL_CACHE_TTL = float(os.environ.get("EMAIL_CACHE_TTL", "0"))
+
+def _cached_email(pid):
+    entry = _email_cache.get(pid)
+    if entry is None:
+        return None
+    email, cached_at = entry
+    if EMAIL_CACHE_TTL and time.monotonic() - cached_at > EMAIL_CACHE_TTL:
+        del _email_cache[pid]
+        return None
+    return email
+
+def prime_user_emails(rows):
+    """Cache emails from Faculty rows the caller already fetched (dicts with pid and email)"""
+    now = time.monotonic()
+    for row in rows:
+        _email_cache[row['pid']] = (row.get('email') or f"{row['pid']}@vt.edu", now)
+
+def get_user_emails(pids, conn=None):
+    """
+    Resolve many PIDs to emails with one Faculty query, fallback to pid@vt.edu.
+    Cached PIDs are not looked up again; empty PIDs (null/undefined from Node) are dropped.
+    """
+    result = {}
+    missing = []
+    for pid in dict.fromkeys(pid for pid in pids if pid):
+        email = _cached_email(pid)
+        if email is None:
+            missing.append(pid)
+        else:
+            result[pid] = email
+    if not missing:
+        return result
     try:
-        print(f"[USER_EMAIL] Looking up email for PID: {pid}")
-        conn = get_db_conn()
+        log.debug("[USER_EMAIL] Looking up emails for %s PID(s)", len(missing))
+        conn = conn or get_shared_conn()
         cursor = conn.cursor(dictionary=True)
-        # Check if pid is in Faculty table
-        cursor.execute("SELECT email FROM Faculty WHERE pid = %s", (pid,))
-        result = cursor.fetchone()
+        placeholders = ", ".join(["%s"] * len(missing))
+        with METRICS.timer("db_query", query="user_emails"):
+            cursor.execute(f"SELECT pid, email FROM Faculty WHERE pid IN ({placeholders})", tuple(missing))
+            rows = cursor.fetchall()
         cursor.close()
-        conn.close()
-        if result and result.get("email"):
-            print(f"[USER_EMAIL] Found email in Faculty table: {result['email']}")
-            return result["email"]
-        fallback_email = f"{pid}@vt.edu"
-        print(f"[USER_EMAIL] No Faculty record found, using fallback: {fallback_email}")
-        return fallback_email
+        prime_user_emails(rows)
     except Exception as e:
-        print(f"[USER_EMAIL ERROR] Failed to retrieve email for {pid}: {e}")
-        print(f"[USER_EMAIL ERROR] Traceback: {traceback.format_exc()}")
-        return f"{pid}@vt.edu"
+        log.error("[USER_EMAIL ERROR] Failed to retrieve emails for %s: %s", missing, e, exc_info=True)
+        return {**result, **{pid: f"{pid}@vt.edu" for pid in missing}}
+    now = time.monotonic()
+    for pid in missing:
+        if pid not in _email_cache:
+            # No Faculty record - cache the fallback too so we don't query for it again
+            _email_cache[pid] = (f"{pid}@vt.edu", now)
+        result[pid] = _email_cache[pid][0]
+    return result
+
+def get_user_email(pid, conn=None):
+    """Retrieve email for a given PID from Faculty table, fallback to pid@vt.edu"""
+    return get_user_emails([pid], conn)[pid]
+
+class SMTPSession:
+    """
+    Reusable SMTP connection - logs in once and sends many messages over the same session.
+    Reconnects when the server drops the connection (including a 421 idle-timeout reply) or after max_messages sends.
+    """
+
+    def __init__(self, host=None, port=None, use_ssl=None, user=None, password=None, max_messages=None):
+        self.host = host or smtp_server
+        self.port = port or smtp_port
+        self.use_ssl = smtp_use_ssl if use_ssl is None else use_ssl
+        self.user = mail_user if user is None else user
+        self.password = mail_password if password is None else password
+        self.max_messages = smtp_max_messages if max_messages is None else max_messages
+        self.server = None
+        self.sent_on_conn = 0
+        self.connects = 0
+
+    def connect(self):
+        """Open the connection and authenticate (skipped when no user is configured, e.g. local smtpd)"""
+        import smtplib
+        self.close()
+        log.debug("[SMTP] Connecting to SMTP server %s:%s", self.host, self.port)
+        with METRICS.timer("smtp_connect"):
+            if self.use_ssl:
+                server = smtplib.SMTP_SSL(self.host, self.port, context=ssl_context())
+            else:
+                server = smtplib.SMTP(self.host, self.port)
+        try:
+            if self.user:
+                log.debug("[SMTP] Authenticating as %s", self.user)
+                with METRICS.timer("smtp_login"):
+                    server.login(self.user, self.password)
+                log.debug("[SMTP] Authentication successful")
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.sent_on_conn = 0
+        self.connects += 1
+
+    def close(self):
+        """QUIT the current connection if there is one, ignoring errors from a dead socket"""
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+        self.server = None
+        self.sent_on_conn = 0
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        """Send over the open session, reconnecting once if the server dropped or timed us out - returns refused recipients"""
+        import smtplib
+        if self.server is None or (self.max_messages and self.sent_on_conn >= self.max_messages):
+            if self.server is not None:
+                log.debug("[SMTP] Reached %s messages on this connection, reconnecting", self.sent_on_conn)
+            self.connect()
+        try:
+            with METRICS.timer("smtp_send"):
+                refused = self.server.sendmail(from_addr, to_addrs, msg)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException) as e:
+            # 421 = service closing the channel, e.g. Postfix timing out an idle session - same as a disconnect
+            if isinstance(e, smtplib.SMTPResponseException) and e.smtp_code != 421:
+                raise
+            log.debug("[SMTP] Server disconnected (%s), reconnecting and retrying", e)
+            self.close()
+            self.connect()
+            with METRICS.timer("smtp_send"):
+                refused = self.server.sendmail(from_addr, to_addrs, msg)
+        self.sent_on_conn += 1
+        return refused
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+_smtp_session = None
+
+def get_smtp_session():
+    """Shared SMTP session for the current run"""
+    global _smtp_session
+    if _smtp_session is None:
+        _smtp_session = SMTPSession()
+    return _smtp_session
+
+def close_smtp_session():
+    """Close the shared SMTP session at the end of a run"""
+    global _smtp_session
+    if _smtp_session is not None:
+        log.info("[SMTP] Closing session (%s connection(s) opened this run)", _smtp_session.connects)
+        _smtp_session.close()
+        _smtp_session = None
+
+SENDER_ADDRESS = "gradinfo@cs.vt.edu"
+
+@lru_cache(maxsize=64)
+def _mime_payload(subject, html_body, text_body):
+    """
+    Serialized message minus the To header - built once per distinct body and reused for every recipient.
+    Bodies come from the memoized templates, so repeat calls hit this cache without rebuilding any MIME parts.
+    """
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.utils import formataddr
+    message = MIMEMultipart("alternative")
+    message["From"] = formataddr(("SAACS Plan of Study", SENDER_ADDRESS))
+    message["Subject"] = subject
+    if text_body:
+        message.attach(MIMEText(text_body, "plain"))
+    message.attach(MIMEText(html_body, "html"))
+    return message.as_string()
+
+def build_message(to_header, subject, html_body, text_body=None):
+    """Full message text for one envelope: the shared payload with the To header prepended"""
+    return f"To: {to_header}\n" + _mime_payload(subject, html_body, text_body or "")
 
 # sends email function general
-def send_email(to_email, subject, html_body, text_body=None):
+def send_email(to_email, subject, html_body, text_body=None, session=None):
     """Generic email sending function - logs all steps for debugging"""
-    sender_address = "gradinfo@cs.vt.edu"
+    import smtplib
+    sender_address = SENDER_ADDRESS
     try:
-        print(f"[EMAIL_SEND] Creating message for {to_email}")
-        print(f"[EMAIL_SEND] Subject: {subject}")
-        message = MIMEMultipart("alternative")
-        message["From"] = formataddr(("SAACS Plan of Study", sender_address))
-        message["To"] = to_email
-        message["Subject"] = subject
-        
-        if text_body:
-            print(f"[EMAIL_SEND] Adding plain text body ({len(text_body)} chars)")
-            message.attach(MIMEText(text_body, "plain"))
-        else:
-            print(f"[EMAIL_SEND] No plain text body provided")
-        
-        print(f"[EMAIL_SEND] Adding HTML body ({len(html_body)} chars)")
-        message.attach(MIMEText(html_body, "html"))
+        log.debug("[EMAIL_SEND] Creating message for %s", to_email)
+        log.debug("[EMAIL_SEND] Subject: %s (html %s chars, text %s chars)", subject, len(html_body), len(text_body or ''))
+        message = build_message(to_email, subject, html_body, text_body)
         
         # Send email using MAIL_USER / MAIL_PASSWORD (with sender_* fallback)
         if not mail_password:
-            print(f"[ERROR] MAIL_PASSWORD not set; aborting send to {to_email}")
+            log.error("[ERROR] MAIL_PASSWORD not set; aborting send to %s", to_email)
             return False
         
-        print(f"[EMAIL_SEND] Connecting to SMTP server {smtp_server}:{smtp_port}")
-        with smtplib.SMTP_SSL(smtp_server, smtp_port, context=context) as server:
-            try:
-                print(f"[EMAIL_SEND] Authenticating as {mail_user}")
-                server.login(mail_user, mail_password)
-                print(f"[EMAIL_SEND] Authentication successful")
-            except Exception as e:
-                print(f"[ERROR] Failed to log into SMTP server: {e}")
-                print(f"[ERROR] Traceback: {traceback.format_exc()}")
-                return False
-            
-            print(f"[EMAIL_SEND] Sending email from {sender_address} to {to_email}")
-            server.sendmail(sender_address, to_email, message.as_string())
+        session = session or get_smtp_session()
+        try:
+            log.debug("[EMAIL_SEND] Sending email from %s to %s", sender_address, to_email)
+            session.sendmail(sender_address, to_email, message)
+        except smtplib.SMTPAuthenticationError as e:
+            log.error("[ERROR] Failed to log into SMTP server: %s", e, exc_info=True)
+            return False
         
-        print(f"[EMAIL_SUCCESS] Sent to {to_email}: {subject}")
+        log.debug("[EMAIL_SUCCESS] Sent to %s: %s", to_email, subject)
         return True
         
     except Exception as e:
-        print(f"[ERROR] Failed to send email to {to_email}: {str(e)}")
-        print(f"[ERROR] Traceback: {traceback.format_exc()}")
+        log.error("[ERROR] Failed to send email to %s: %s", to_email, e, exc_info=True)
         return False
 
+def send_broadcast(to_emails, subject, html_body, text_body=None, session=None):
+    """
+    Send one identical message to several recipients in a single envelope (one DATA, many RCPT TO).
+    Recipients are hidden behind an undisclosed-recipients To header. Returns {to_email: ok}.
+    """
+    to_emails = list(to_emails)
+    try:
+        if not mail_password:
+            log.error("[ERROR] MAIL_PASSWORD not set; aborting broadcast to %s recipients", len(to_emails))
+            return {to_email: False for to_email in to_emails}
+        message = build_message("undisclosed-recipients:;", subject, html_body, text_body)
+        session = session or get_smtp_session()
+        log.debug("[EMAIL_SEND] Broadcasting '%s' to %s recipients in one envelope", subject, len(to_emails))
+        refused = session.sendmail(SENDER_ADDRESS, to_emails, message) or {}
+        for to_email, reason in refused.items():
+            log.error("[ERROR] Relay refused %s: %s", to_email, reason)
+        log.debug("[EMAIL_SUCCESS] Broadcast to %s recipients: %s", len(to_emails) - len(refused), subject)
+        return {to_email: to_email not in refused for to_email in to_emails}
+    except Exception as e:
+        log.error("[ERROR] Failed to broadcast to %s recipients: %s", len(to_emails), e, exc_info=True)
+        return {to_email: False for to_email in to_emails}
+
+class SendScheduler:
+    """
+    Sends pre-rendered emails through a bounded thread pool; each task borrows an SMTPSession from the
+    scheduler's pool, so at most `concurrency` connections are open.
+    Emails to the same recipient are sent in submission order by one worker.
+    With max_rcpt > 1, recipients who get a single email identical to other recipients' share one envelope.
+    run() returns [(payload, ok), ...] in submission order so callers can do their bookkeeping afterwards.
+    Sessions are closed at the end of each run() unless persistent=True, in which case they are reused by
+    later runs (e.g. one per keyset page) until close().
+    """
+    outcome = "sent"
+
+    def __init__(self, concurrency=None, max_rcpt=None, persistent=False):
+        self.concurrency = max(1, SMTP_CONCURRENCY if concurrency is None else concurrency)
+        self.max_rcpt = max(1, SMTP_MAX_RCPT if max_rcpt is None else max_rcpt)
+        self.persistent = persistent
+        self.jobs = {}  # recipient -> [(index, email, payload), ...]
+        self.count = 0
+        self._idle = []
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def submit(self, email, payload=None):
+        self.jobs.setdefault(email.to_email, []).append((self.count, email, payload))
+        self.count += 1
+
+    @contextmanager
+    def _session(self):
+        """Borrow an idle session (opening a new one only if every session is busy) and return it afterwards"""
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is None:
+            session = SMTPSession()
+            with self._lock:
+                self._sessions.append(session)
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._idle.append(session)
+
+    def _send_all(self, recipient_jobs):
+        with self._session() as session:
+            return [
+                (index, payload, send_email(email.to_email, email.subject, email.html_body, email.text_body, session=session))
+                for index, email, payload in recipient_jobs
+            ]
+
+    def _send_broadcast(self, jobs):
+        email = jobs[0][1]
+        with self._session() as session:
+            results = send_broadcast(
+                [job_email.to_email for _, job_email, _ in jobs], email.subject, email.html_body, email.text_body,
+                session=session
+            )
+        return [(index, payload, results[job_email.to_email]) for index, job_email, payload in jobs]
+
+    def _tasks(self):
+        """Split the queue into (function, jobs) units of work - per-recipient chains and shared envelopes"""
+        if self.max_rcpt == 1:
+            return [(self._send_all, recipient_jobs) for recipient_jobs in self.jobs.values()]
+        tasks = []
+        groups = {}  # identical body -> single-email recipients' jobs
+        for recipient_jobs in self.jobs.values():
+            if len(recipient_jobs) > 1:
+                # Keep this recipient's emails in order on one worker
+                tasks.append((self._send_all, recipient_jobs))
+                continue
+            _, email, _ = recipient_jobs[0]
+            groups.setdefault((email.subject, email.html_body, email.text_body), []).append(recipient_jobs[0])
+        for group in groups.values():
+            for start in range(0, len(group), self.max_rcpt):
+                chunk = group[start:start + self.max_rcpt]
+                tasks.append((self._send_broadcast if len(chunk) > 1 else self._send_all, chunk))
+        return tasks
+
+    def run(self):
+        """Send everything submitted so far and return the aggregated results"""
+        if not self.jobs:
+            return []
+        tasks = self._tasks()
+        workers = min(self.concurrency, len(tasks))
+        log.info("[SCHEDULER] Sending %s email(s) to %s recipient(s) as %s task(s) with %s worker(s)", self.count, len(self.jobs), len(tasks), workers)
+        results = []
+        try:
+            if workers == 1:
+                for send, jobs in tasks:
+                    results.extend(send(jobs))
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for batch in pool.map(lambda task: task[0](task[1]), tasks):
+                        results.extend(batch)
+        finally:
+            if not self.persistent:
+                self.close()
+            self.jobs = {}
+            self.count = 0
+        results.sort(key=lambda result: result[0])
+        sent = sum(1 for _, _, ok in results if ok)
+        log.info("[SCHEDULER] Done: %s sent, %s failed", sent, len(results) - sent)
+        return [(payload, ok) for _, payload, ok in results]
+
+    def close(self):
+        """Close every SMTP session this scheduler opened"""
+        with self._lock:
+            sessions, self._sessions, self._idle = self._sessions, [], []
+        for session in sessions:
+            session.close()
+
 # POS Status constants (same as Node.js)
 POS_STATUS = {
     "SAVED": 1,
@@ -163,11 +654,19 @@ STATUS_MAP = {
     99: "Rejected"
 }
 
-def build_pos_list_html(pos_entries):
-    """
-    Build an HTML table of POS entries for faculty notification.
-    """
-    html = """
+# A fully rendered message, ready to hand to send_email or a SendScheduler
+Email = namedtuple("Email", ["to_email", "subject", "html_body", "text_body"])
+
+# ============================================================================
+# TEMPLATES - Compiled once at startup with SITE_URL already filled in.
+# Fragments that are identical for many recipients (status tables, faculty bodies) are memoized,
+# so each distinct content is rendered once per run instead of once per recipient.
+# ============================================================================
+def _compile(template):
+    """Pre-bind $site_url so only the per-message fields are substituted later"""
+    return Template(Template(template).safe_substitute(site_url=SITE_URL))
+
+_POS_TABLE_HEAD = """
     <table style="border-collapse: collapse; width: 100%; margin-top: 20px;">
         <thead>
             <tr style="background-color: #4a90e2; color: white;">
@@ -180,239 +679,1132 @@ def build_pos_list_html(pos_entries):
         </thead>
         <tbody>
     """
-    
-    for entry in pos_entries:
-        status_name = STATUS_MAP.get(entry['current_status'], f"Status {entry['current_status']}")
-        html += f"""
+
+_POS_TABLE_ROW = Template("""
             <tr style="background-color: #f9f9f9;">
-                <td style="border: 1px solid #ddd; padding: 12px;">{entry['pos_id']}</td>
-                <td style="border: 1px solid #ddd; padding: 12px;">{entry['pid']}</td>
-                <td style="border: 1px solid #ddd; padding: 12px;">{entry['pos_type']}</td>
-                <td style="border: 1px solid #ddd; padding: 12px;">{entry['committee_chair']}</td>
-                <td style="border: 1px solid #ddd; padding: 12px;">{status_name}</td>
+                <td style="border: 1px solid #ddd; padding: 12px;">$pos_id</td>
+                <td style="border: 1px solid #ddd; padding: 12px;">$pid</td>
+                <td style="border: 1px solid #ddd; padding: 12px;">$pos_type</td>
+                <td style="border: 1px solid #ddd; padding: 12px;">$committee_chair</td>
+                <td style="border: 1px solid #ddd; padding: 12px;">$status_name</td>
             </tr>
-        """
-    
-    html += """
+        """)
+
+_POS_TABLE_TAIL = """
         </tbody>
     </table>
     """
-    return html
 
-def student_approved_email(student_pid):
-    to_email = f"{student_pid}@vt.edu"
-    subject = f"Plan of Study Approved"
-    print(f"[STUDENT_APPROVED] Preparing approval email for PID {student_pid}")
-    print(f"[STUDENT_APPROVED] Target email: {to_email}")
-    text_body = f"""
+_STUDENT_APPROVED_TEXT = _compile("""
     Your Plan of Study has been approved.
     Congratulations! Your Plan of Study has been successfully approved by the graduate school.
 
-    For more information, visit: {SITE_URL}
+    For more information, visit: $site_url
 
     Best regards,
     SAACS Plan of Study
-    """
-    html_body = f"""
+    """).template
+
+_STUDENT_APPROVED_HTML = _compile("""
     <html>
         <body>
             <h2>Plan of Study Approved</h2>
             <p>Your Plan of Study has been approved.</p>
             <p><strong>Congratulations!</strong> Your Plan of Study has been successfully approved by the graduate school.</p>
             
-            <p>For more information, visit: <a href="{SITE_URL}">{SITE_URL}</a></p>
+            <p>For more information, visit: <a href="$site_url">$site_url</a></p>
             
             <p>Best regards,<br>
             SAACS Plan of Study System<br></p>
         </body>
     </html>
-    """
-    return send_email(to_email, subject, html_body, text_body)
+    """).template
 
-def student_rejected_email(student_pid):
-    to_email = f"{student_pid}@vt.edu"
-    subject = f"Plan of Study Rejected"
-    print(f"[STUDENT_REJECTED] Preparing rejection email for PID {student_pid}")
-    print(f"[STUDENT_REJECTED] Target email: {to_email}")
-    text_body = f"""
+_STUDENT_REJECTED_TEXT = _compile("""
     Your Plan of Study has been rejected.
-    
-    For more information, visit: {SITE_URL}
+    $note_text
+    For more information, visit: $site_url
 
     Best regards,
     SAACS Plan of Study
-    """
-    html_body = f"""
+    """)
+
+_STUDENT_REJECTED_HTML = _compile("""
     <html>
         <body>
             <h2>Plan of Study Rejected</h2>
             <p>Your Plan of Study has been rejected.</p>
+            $note_html
+            <p>For more information, visit: <a href="$site_url">$site_url</a></p>
             
-            <p>For more information, visit: <a href="{SITE_URL}">{SITE_URL}</a></p>
+            <p>Best regards,<br>
+            SAACS Plan of Study System<br></p>
+        </body>
+    </html>
+    """)
+
+_STUDENT_STATUS_TEXT = _compile("""
+    The status of your Plan of Study has changed from $old_status_name to $new_status_name.
+    $note_text
+    For more information, visit: $site_url
+
+    Best regards,
+    SAACS Plan of Study
+    """)
+
+_STUDENT_STATUS_HTML = _compile("""
+    <html>
+        <body>
+            <h2>Plan of Study Status Updated</h2>
+            <p>The status of your Plan of Study has changed from <strong>$old_status_name</strong> to <strong>$new_status_name</strong>.</p>
+            $note_html
+            <p>For more information, visit: <a href="$site_url">$site_url</a></p>
             
             <p>Best regards,<br>
             SAACS Plan of Study System<br></p>
         </body>
     </html>
-    """
-    return send_email(to_email, subject, html_body, text_body)
+    """)
 
-def faculty_notification_email(faculty_pid, pos_entries, status):
-    status_name = STATUS_MAP.get(status, f"Status {status}")
-    subject = f"Plan(s) of Study Awaiting Your Review"
-    pos_list_html = build_pos_list_html(pos_entries)
-    
-    text_body = f"""
+_ADMIN_DECISION_TEXT = _compile("""
+    Plan of Study $pos_id for student $student_pid received a final decision: $decision.
+
+    For more information, visit: $site_url
+
+    Best regards,
+    SAACS Plan of Study System
+    gradinfo@cs.vt.edu
+    """)
+
+_ADMIN_DECISION_HTML = _compile("""
+    <html>
+        <body>
+            <h2>Plan of Study $pos_id: $decision_title</h2>
+            <p>Plan of Study <strong>$pos_id</strong> for student <strong>$student_pid</strong> received a final decision: $decision.</p>
+            
+            <p>For more information, visit: <a href="$site_url">$site_url</a></p>
+            
+            <p>Best regards,<br>
+            SAACS Plan of Study System<br>
+            gradinfo@cs.vt.edu</p>
+        </body>
+    </html>
+    """)
+
+_FACULTY_TEXT = _compile("""
     You have Plan(s) of Study awaiting your review.
 
-    Status: {status_name}
-    Number of POS entries: {len(pos_entries)}
+$summary
 
     Please log into the SAACS Plan of Study system to review these submissions.
 
-    For more information, visit: {SITE_URL}
+    For more information, visit: $site_url
 
     Best regards,
     SAACS Plan of Study System
     gradinfo@cs.vt.edu
-    """
-    html_body = f"""
+    """)
+
+_FACULTY_HTML = _compile("""
     <html>
         <body>
             <h2>Plan(s) of Study Awaiting Your Review</h2>
-            <p>You have <strong>{len(pos_entries)}</strong> Plan(s) of Study awaiting your review.</p>
-            
-            <h3>Status: {status_name}</h3>
+            <p>You have <strong>$total</strong> Plan(s) of Study awaiting your review.</p>
             
-            {pos_list_html}
+            $sections
             
             <p style="margin-top: 20px;">Please log into the SAACS Plan of Study system to review these submissions.</p>
             
-            <p>For more information, visit: <a href="{SITE_URL}">{SITE_URL}</a></p>
+            <p>For more information, visit: <a href="$site_url">$site_url</a></p>
             
             <p>Best regards,<br>
             SAACS Plan of Study System<br>
             gradinfo@cs.vt.edu</p>
         </body>
     </html>
+    """)
+
+_DIGEST_SECTION_HTML = Template("""
+            <h3>Status: $status_name ($count)</h3>
+            $table
+        """)
+
+def _status_name(status):
+    return STATUS_MAP.get(status, f"Status {status}")
+
+def _plan_rows(pos_entries):
+    """Hashable snapshot of the columns shown in the POS table, used as the memo key"""
+    return tuple(
+        (entry['pos_id'], entry['pid'], entry['pos_type'], entry['committee_chair'], entry['current_status'])
+        for entry in pos_entries
+    )
+
+@lru_cache(maxsize=512)
+def _pos_table_html(rows):
+    return _POS_TABLE_HEAD + "".join(
+        _POS_TABLE_ROW.substitute(
+            pos_id=pos_id, pid=pid, pos_type=pos_type, committee_chair=committee_chair,
+            status_name=_status_name(status)
+        )
+        for pos_id, pid, pos_type, committee_chair, status in rows
+    ) + _POS_TABLE_TAIL
+
+def build_pos_list_html(pos_entries):
+    """
+    Build an HTML table of POS entries for faculty notification.
     """
-    return send_email(get_user_email(faculty_pid), subject, html_body, text_body)
+    return _pos_table_html(_plan_rows(pos_entries))
 
-def student_emailer():
+def _note_fragments(note):
+    if not note:
+        return "", ""
+    return f"\n    Note: {note}\n", f"<p><strong>Note:</strong> {html.escape(note)}</p>"
+
+@METRICS.timed("render", template="student_approved")
+def render_student_approved(student_pid):
+    to_email = f"{student_pid}@vt.edu"
+    subject = f"Plan of Study Approved"
+    log.debug("[STUDENT_APPROVED] Preparing approval email for PID %s", student_pid)
+    log.debug("[STUDENT_APPROVED] Target email: %s", to_email)
+    return Email(to_email, subject, _STUDENT_APPROVED_HTML, _STUDENT_APPROVED_TEXT)
+
+def student_approved_email(student_pid):
+    return send_email(*render_student_approved(student_pid))
+
+@METRICS.timed("render", template="student_rejected")
+def render_student_rejected(student_pid, note=None):
+    to_email = f"{student_pid}@vt.edu"
+    subject = f"Plan of Study Rejected"
+    log.debug("[STUDENT_REJECTED] Preparing rejection email for PID %s", student_pid)
+    log.debug("[STUDENT_REJECTED] Target email: %s", to_email)
+    note_text, note_html = _note_fragments(note)
+    text_body = _STUDENT_REJECTED_TEXT.substitute(note_text=note_text)
+    html_body = _STUDENT_REJECTED_HTML.substitute(note_html=note_html)
+    return Email(to_email, subject, html_body, text_body)
+
+def student_rejected_email(student_pid, note=None):
+    return send_email(*render_student_rejected(student_pid, note))
+
+@METRICS.timed("render", template="student_status_changed")
+def render_student_status_changed(student_pid, old_status_name, new_status_name, note=None):
+    to_email = f"{student_pid}@vt.edu"
+    subject = f"Plan of Study Status Updated"
+    log.debug("[STUDENT_STATUS] Preparing status change email for PID %s: %s -> %s", student_pid, old_status_name, new_status_name)
+    note_text, note_html = _note_fragments(note)
+    fields = dict(old_status_name=old_status_name, new_status_name=new_status_name)
+    text_body = _STUDENT_STATUS_TEXT.substitute(fields, note_text=note_text)
+    html_body = _STUDENT_STATUS_HTML.substitute(fields, note_html=note_html)
+    return Email(to_email, subject, html_body, text_body)
+
+def student_status_changed_email(student_pid, old_status_name, new_status_name, note=None):
+    return send_email(*render_student_status_changed(student_pid, old_status_name, new_status_name, note))
+
+@METRICS.timed("render", template="admin_decision")
+def render_admin_decision(admin_pid, decision, student_pid, pos_id, to_email=None):
+    subject = f"Plan of Study {pos_id}: {decision.capitalize()}"
+    log.debug("[ADMIN_NOTIFY] Preparing %s notice for admin %s (POS %s, student %s)", decision, admin_pid, pos_id, student_pid)
+    fields = dict(pos_id=pos_id, student_pid=student_pid, decision=decision, decision_title=decision.capitalize())
+    text_body = _ADMIN_DECISION_TEXT.substitute(fields)
+    html_body = _ADMIN_DECISION_HTML.substitute(fields)
+    return Email(to_email or get_user_email(admin_pid), subject, html_body, text_body)
+
+def admin_decision_email(admin_pid, decision, student_pid, pos_id, to_email=None):
+    return send_email(*render_admin_decision(admin_pid, decision, student_pid, pos_id, to_email))
+
+@lru_cache(maxsize=256)
+def _faculty_notification_bodies(status, rows):
+    """(html_body, text_body) for one status - the same for every recipient of the same plans"""
+    status_name = _status_name(status)
+    text_body = _FACULTY_TEXT.substitute(
+        summary=f"    Status: {status_name}\n    Number of POS entries: {len(rows)}"
+    )
+    html_body = _FACULTY_HTML.substitute(
+        total=len(rows),
+        sections=f"<h3>Status: {status_name}</h3>\n            \n            {_pos_table_html(rows)}"
+    )
+    return html_body, text_body
+
+@METRICS.timed("render", template="faculty_notification")
+def render_faculty_notification(faculty_pid, pos_entries, status, to_email=None):
+    subject = f"Plan(s) of Study Awaiting Your Review"
+    html_body, text_body = _faculty_notification_bodies(status, _plan_rows(pos_entries))
+    return Email(to_email or get_user_email(faculty_pid), subject, html_body, text_body)
+
+def faculty_notification_email(faculty_pid, pos_entries, status, to_email=None):
+    return send_email(*render_faculty_notification(faculty_pid, pos_entries, status, to_email))
+
+@lru_cache(maxsize=256)
+def _faculty_digest_bodies(sections):
+    """(html_body, text_body) for a digest - sections is ((status, rows), ...)"""
+    text_body = _FACULTY_TEXT.substitute(summary="\n".join(
+        f"    {_status_name(status)}: {len(rows)} POS entries" for status, rows in sections
+    ))
+    html_body = _FACULTY_HTML.substitute(
+        total=sum(len(rows) for _, rows in sections),
+        sections="\n".join(
+            _DIGEST_SECTION_HTML.substitute(status_name=_status_name(status), count=len(rows), table=_pos_table_html(rows))
+            for status, rows in sections
+        )
+    )
+    return html_body, text_body
+
+@METRICS.timed("render", template="faculty_digest")
+def render_faculty_digest(faculty_pid, sections, to_email=None):
+    """One message covering every pending status for this faculty member - sections is [(status, pos_entries), ...]"""
+    subject = f"Plan(s) of Study Awaiting Your Review"
+    html_body, text_body = _faculty_digest_bodies(tuple((status, _plan_rows(pos_entries)) for status, pos_entries in sections))
+    return Email(to_email or get_user_email(faculty_pid), subject, html_body, text_body)
+
+# ============================================================================
+# NOTIFICATION LEDGER - Remembers which (pos_id, status, history_id, recipient) were already emailed
+# so repeated runs only send for new status changes.
+# ============================================================================
+LEDGER_TABLE = "POS_EmailLedger"
+
+def ensure_ledger(conn):
+    """Create the ledger table if this database does not have it yet"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+            pos_id INT NOT NULL,
+            status INT NOT NULL,
+            history_id INT NOT NULL DEFAULT 0,
+            recipient VARCHAR(64) NOT NULL,
+            sent_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (pos_id, status, history_id, recipient)
+        )
+    """)
+    cursor.close()
+
+def ledger_key(plan, recipient):
     """
-    Send emails to students for APPROVED or REJECTED status changes.
-    Students get simple text emails notifying them of approval or rejection.
+    Ledger key for one plan notification - history_id 0 when the plan has no history rows.
+    recipient is stored as VARCHAR, so it is compared as a string (event args like 1234 arrive JSON-decoded as ints).
     """
-    print("=" * 80)
-    print("[STUDENT_EMAILER] ===== START STUDENT EMAILER =====")
-    print("=" * 80)
-    try:
-        print("[STUDENT_EMAILER] Connecting to database...")
-        conn = get_db_conn()
-        cursor = conn.cursor(dictionary=True)
-        
-        print("[STUDENT_EMAILER] Querying POS plans with status APPROVED (6) or REJECTED (99)...")
-        cursor.execute("""
-            SELECT 
-                p.pos_id,
-                p.pid,
-                p.current_status
-            FROM POS_PlanOfStudy p
-            WHERE
-                p.current_status IN (6, 99)
-            ORDER BY p.pos_id DESC
-            LIMIT 100
-        """)
-        plans = cursor.fetchall()
-        print(f"[STUDENT_EMAILER] Found {len(plans)} plans to process")
+    return (plan['pos_id'], plan['current_status'], plan.get('history_id') or 0, str(recipient))
+
+def ledger_sent(conn, keys):
+    """Return the subset of keys already in the ledger, using one query"""
+    keys = set(keys)
+    if not keys:
+        return set()
+    pos_ids = sorted({key[0] for key in keys})
+    placeholders = ", ".join(["%s"] * len(pos_ids))
+    cursor = conn.cursor()
+    with METRICS.timer("db_query", query="ledger_sent"):
+        cursor.execute(
+            f"SELECT pos_id, status, history_id, recipient FROM {LEDGER_TABLE} WHERE pos_id IN ({placeholders})",
+            tuple(pos_ids)
+        )
+        sent = {tuple(row) for row in cursor.fetchall()}
+    cursor.close()
+    return keys & sent
+
+def ledger_record(conn, keys):
+    """Record successfully sent notifications in one batch"""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+    cursor = conn.cursor()
+    with METRICS.timer("db_query", query="ledger_record"):
+        cursor.executemany(
+            f"INSERT IGNORE INTO {LEDGER_TABLE} (pos_id, status, history_id, recipient) VALUES (%s, %s, %s, %s)",
+            keys
+        )
+        conn.commit()
+    cursor.close()
+    log.info("[LEDGER] Recorded %s sent notification(s)", len(keys))
+
+# ============================================================================
+# CHANGE FEED - POS_History high-water mark per emailer, so incremental runs only look at
+# plans whose history changed since the last successful run.
+# ============================================================================
+CHECKPOINT_TABLE = "POS_EmailerCheckpoint"
 
-        if len(plans) == 0:
-            print("[SYSTEM] No student POS status changes to email")
-            cursor.close()
-            conn.close()
+# Set from --incremental / --full-rescan (or EMAILER_INCREMENTAL=1)
+INCREMENTAL = os.environ.get("EMAILER_INCREMENTAL", "0") == "1"
+FULL_RESCAN = False
+
+def ensure_checkpoints(conn):
+    """Create the checkpoint table if this database does not have it yet"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            history_id INT NOT NULL,
+            updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.close()
+
+def history_changes(conn, name):
+    """
+    Work out what an emailer run should scan.
+    Returns (pos_ids, high_water): pos_ids is None for a full rescan (not incremental, first run,
+    or --full-rescan), otherwise the plans with POS_History rows newer than the checkpoint.
+    high_water is the newest history_id seen, to be saved once the run succeeds.
+    """
+    ensure_checkpoints(conn)
+    cursor = conn.cursor()
+    with METRICS.timer("db_query", query="checkpoint_read"):
+        cursor.execute("SELECT COALESCE(MAX(history_id), 0) FROM POS_History")
+        high_water = cursor.fetchone()[0]
+        cursor.execute(f"SELECT history_id FROM {CHECKPOINT_TABLE} WHERE name = %s", (name,))
+        row = cursor.fetchone()
+    if not INCREMENTAL or FULL_RESCAN or row is None:
+        cursor.close()
+        reason = "not incremental" if not INCREMENTAL else ("full rescan requested" if FULL_RESCAN else "no checkpoint yet")
+        log.info("[CHANGES] %s: full rescan (%s), high-water history_id=%s", name, reason, high_water)
+        return None, high_water
+    checkpoint = row[0]
+    with METRICS.timer("db_query", query="history_changes"):
+        cursor.execute(
+            "SELECT DISTINCT plan_of_study FROM POS_History WHERE history_id > %s AND history_id <= %s",
+            (checkpoint, high_water)
+        )
+        pos_ids = [r[0] for r in cursor.fetchall()]
+    cursor.close()
+    log.info("[CHANGES] %s: %s plan(s) changed between history_id %s and %s", name, len(pos_ids), checkpoint, high_water)
+    return pos_ids, high_water
+
+def save_checkpoint(conn, name, high_water):
+    """Advance the emailer's high-water mark after a run with no failed sends"""
+    cursor = conn.cursor()
+    with METRICS.timer("db_query", query="checkpoint_save"):
+        cursor.execute(
+            f"INSERT INTO {CHECKPOINT_TABLE} (name, history_id) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE history_id = VALUES(history_id)",
+            (name, high_water)
+        )
+        conn.commit()
+    cursor.close()
+    log.info("[CHANGES] %s: checkpoint saved at history_id=%s", name, high_water)
+
+# Keyset position (last pos_id handled) of a paginated pass that stopped early, per emailer
+RESUME_TABLE = "POS_EmailerResume"
+
+def ensure_resume(conn):
+    """Create the resume table if this database does not have it yet"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {RESUME_TABLE} (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            last_pos_id INT NOT NULL,
+            updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.close()
+
+def load_resume(conn, name):
+    """pos_id an unfinished paginated pass stopped at, or None to start from the top"""
+    ensure_resume(conn)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT last_pos_id FROM {RESUME_TABLE} WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+def save_resume(conn, name, last_seen):
+    """Remember where a paginated pass stopped (last_seen pos_id), or clear it once the pass completes (None)"""
+    cursor = conn.cursor()
+    if last_seen is None:
+        cursor.execute(f"DELETE FROM {RESUME_TABLE} WHERE name = %s", (name,))
+    else:
+        cursor.execute(
+            f"INSERT INTO {RESUME_TABLE} (name, last_pos_id) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE last_pos_id = VALUES(last_pos_id)",
+            (name, last_seen)
+        )
+        log.info("[CHANGES] %s: pass stopped early, resuming below pos_id %s next run", name, last_seen)
+    conn.commit()
+    cursor.close()
+
+# Rows per fetchmany() round-trip when streaming the faculty plan scan
+FACULTY_FETCH_SIZE = int(os.environ.get("FACULTY_FETCH_SIZE", "500"))
+
+class PlanRow:
+    """
+    Compact plan row for the faculty scan - __slots__ instead of a dict per row.
+    Supports plan['col'] and plan.get('col') so it works with the helpers written for dictionary cursor rows.
+    """
+    __slots__ = ("pos_id", "pid", "pos_type", "committee_chair", "current_status", "history_id")
+
+    def __init__(self, pos_id, pid, pos_type, committee_chair, current_status, history_id=None):
+        self.pos_id = pos_id
+        self.pid = pid
+        self.pos_type = pos_type
+        self.committee_chair = committee_chair
+        self.current_status = current_status
+        self.history_id = history_id
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+def fetch_plan_rows(cursor, size=None):
+    """Yield PlanRows from an executed tuple cursor, fetchmany(size) rows per round-trip"""
+    size = size or FACULTY_FETCH_SIZE
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
             return
+        for row in rows:
+            yield PlanRow(*row)
+
+def plan_filter(pos_ids):
+    """SQL fragment + params restricting POS_PlanOfStudy p to the given plans (no-op for None)"""
+    if pos_ids is None:
+        return "", ()
+    return f"AND p.pos_id IN ({', '.join(['%s'] * len(pos_ids))})", tuple(pos_ids)
+
+# ============================================================================
+# SHARDING - With EMAILER_SHARDS=N (or --shards N) several workers split each batch job by recipient:
+# shard k owns recipients with CRC32(pid) % N == k. Workers claim shards through lease rows in
+# POS_EmailerLease; a crashed worker's lease expires after EMAILER_LEASE_SECONDS and another worker
+# picks the shard up. The emailers renew the lease between pages / statuses and stop if it was lost.
+# Lease times use the database clock (NOW()), so clock skew between worker hosts doesn't matter.
+# Each shard keeps its own checkpoint, and the ledger still guards every send.
+# ============================================================================
+LEASE_TABLE = "POS_EmailerLease"
 
-        keys = []  # list of pos_ids for update
+EMAILER_SHARDS = int(os.environ.get("EMAILER_SHARDS", "1"))
+# A lease must outlive one page / status of a shard run (it is renewed in between); finished shards
+# stay claimed for the cooldown so the other workers of the same cron tick don't run them again
+EMAILER_LEASE_SECONDS = float(os.environ.get("EMAILER_LEASE_SECONDS", "600"))
+EMAILER_SHARD_COOLDOWN_SECONDS = float(os.environ.get("EMAILER_SHARD_COOLDOWN_SECONDS", "60"))
+WORKER_ID = os.environ.get("EMAILER_WORKER_ID") or f"{os.uname().nodename}:{os.getpid()}"
 
-        # Process each plan
-        print(f"[STUDENT_EMAILER] Processing {len(plans)} plans...")
-        for i, plan in enumerate(plans, 1):
-            pos_id = plan['pos_id']
-            pid = plan['pid']
-            current_status = plan['current_status']
-            status_name = STATUS_MAP.get(current_status, f"Unknown({current_status})")
+# (index, count) of the shard being run and (name, index) of its lease, None when not sharded
+SHARD = None
+LEASE = None
 
-            print(f"[STUDENT_EMAILER] [{i}/{len(plans)}] Processing POS {pos_id}, Student {pid}, Status {status_name}")
-            try:
-                if current_status == POS_STATUS["APPROVED"]:
-                    # Check POS_History for most recent entry for this plan_of_study
-                    cursor.execute("""
-                        SELECT history_status, date_changed FROM POS_History
-                        WHERE plan_of_study = %s
-                        ORDER BY date_changed DESC LIMIT 1
-                    """, (pos_id,))
-                    history = cursor.fetchone()
-                    if history:
-                        history_status = history.get("history_status")
-                        date_changed = history.get("date_changed")
-                        print(f"[STUDENT_EMAILER]   Most recent history: status={history_status}, date_changed={date_changed}")
-                        
-                        # Only send email if most recent history status is 6 (APPROVED)
-                        if history_status != 6:
-                            print(f"[STUDENT_EMAILER]   Most recent history status is {history_status}, not 6 (APPROVED), skipping email")
-                            continue
-                        
-                        if date_changed:
-                            # Convert to datetime
-                            if isinstance(date_changed, str):
-                                date_changed_dt = datetime.fromisoformat(date_changed)
-                            else:
-                                date_changed_dt = date_changed
-                            now = datetime.now()
-                            delta = now - date_changed_dt
-                            hours_ago = delta.total_seconds() / 3600
-                            print(f"[STUDENT_EMAILER]   Approval change was {hours_ago:.2f} hours ago")
-                            if delta.total_seconds() >= 24 * 3600:
-                                print(f"[STUDENT_EMAILER]   Approval was 24+ hours ago, skipping email for POS {pos_id}")
-                                continue
-                        else:
-                            print(f"[STUDENT_EMAILER]   No date_changed found in history, skipping email")
-                            continue
-                    else:
-                        print(f"[STUDENT_EMAILER]   No history found for POS {pos_id}, skipping email")
-                        continue
-                    
-                    # Send approval email
-                    print(f"[STUDENT_EMAILER]   Status is APPROVED and within 24 hours, sending approval email...")
-                    if student_approved_email(pid):
-                        keys.append(pos_id)
-                        print(f"[SYSTEM] Sent approval email to {pid} for POS {pos_id}")
-                    else:
-                        print(f"[STUDENT_EMAILER]   Failed to send approval email for POS {pos_id}")
-
-                elif current_status == POS_STATUS["REJECTED"]:
-                    print(f"[STUDENT_EMAILER]   Status is REJECTED, sending rejection email...")
-                    if student_rejected_email(pid):
-                        keys.append(pos_id)
-                        print(f"[SYSTEM] Sent rejection email to {pid} for POS {pos_id}")
-                    else:
-                        print(f"[STUDENT_EMAILER]   Failed to send rejection email for POS {pos_id}")
+class LeaseLost(Exception):
+    """Another worker took over the lease on the shard being run"""
 
-            except Exception as e:
-                print(f"[ERROR] Failed to process POS {pos_id} for student {pid}: {e}")
-                print(f"[ERROR] Traceback: {traceback.format_exc()}")
-                continue
+def ensure_leases(conn):
+    """Create the lease table if this database does not have it yet"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LEASE_TABLE} (
+            name VARCHAR(64) NOT NULL,
+            shard INT NOT NULL,
+            owner VARCHAR(128) NOT NULL,
+            expires_at DATETIME NOT NULL,
+            PRIMARY KEY (name, shard)
+        )
+    """)
+    cursor.close()
+
+def claim_lease(conn, name, shard, seconds=None):
+    """Take the lease on one shard if it is free, expired or already ours - returns True when we hold it"""
+    seconds = EMAILER_LEASE_SECONDS if seconds is None else seconds
+    cursor = conn.cursor()
+    with METRICS.timer("db_query", query="lease_claim"):
+        cursor.execute(
+            f"INSERT IGNORE INTO {LEASE_TABLE} (name, shard, owner, expires_at) "
+            "VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)",
+            (name, shard, WORKER_ID, seconds)
+        )
+        claimed = cursor.rowcount == 1
+        if not claimed:
+            # Conditional update is atomic, so only one worker can take over an expired lease
+            cursor.execute(
+                f"UPDATE {LEASE_TABLE} SET owner = %s, expires_at = NOW() + INTERVAL %s SECOND "
+                "WHERE name = %s AND shard = %s AND (expires_at < NOW() OR owner = %s)",
+                (WORKER_ID, seconds, name, shard, WORKER_ID)
+            )
+            claimed = cursor.rowcount == 1
+        conn.commit()
+    cursor.close()
+    return claimed
+
+def renew_lease(conn):
+    """
+    Heartbeat for the shard being run: push our lease's expiry out again. Raises LeaseLost when another
+    worker has taken the shard over, so the emailer stops before sending anything it might duplicate.
+    """
+    if LEASE is None:
+        return
+    name, shard = LEASE
+    cursor = conn.cursor()
+    with METRICS.timer("db_query", query="lease_renew"):
+        cursor.execute(
+            f"UPDATE {LEASE_TABLE} SET expires_at = NOW() + INTERVAL %s SECOND "
+            "WHERE name = %s AND shard = %s AND owner = %s",
+            (EMAILER_LEASE_SECONDS, name, shard, WORKER_ID)
+        )
+        held = cursor.rowcount == 1
+        if not held:
+            # MySQL counts 0 affected rows when the expiry didn't change (renewed within the same second)
+            cursor.execute(
+                f"SELECT 1 FROM {LEASE_TABLE} WHERE name = %s AND shard = %s AND owner = %s",
+                (name, shard, WORKER_ID)
+            )
+            held = cursor.fetchone() is not None
+        conn.commit()
+    cursor.close()
+    if not held:
+        raise LeaseLost(f"{name} shard {shard} is now leased by another worker")
+
+def finish_lease(conn, name, shard):
+    """Keep the finished shard claimed for the cooldown, then let it expire"""
+    cursor = conn.cursor()
+    cursor.execute(
+        f"UPDATE {LEASE_TABLE} SET expires_at = NOW() + INTERVAL %s SECOND WHERE name = %s AND shard = %s AND owner = %s",
+        (EMAILER_SHARD_COOLDOWN_SECONDS, name, shard, WORKER_ID)
+    )
+    conn.commit()
+    cursor.close()
+
+def shard_filter(column):
+    """SQL fragment + params keeping only recipients (pids in `column`) owned by the current shard"""
+    if SHARD is None:
+        return "", ()
+    index, count = SHARD
+    return f"AND MOD(CRC32({column}), %s) = %s", (count, index)
+
+def checkpoint_name(name):
+    """Per-shard checkpoint name, so one shard's failures don't hold back the others"""
+    if SHARD is None:
+        return name
+    index, count = SHARD
+    return f"{name}@{index}/{count}"
+
+def run_sharded(name, emailer, shards=None):
+    """
+    Run one batch emailer over every shard this worker can claim. Workers start at different
+    shards so N workers on N shards usually don't contend.
+    """
+    global SHARD, LEASE
+    shards = shards or EMAILER_SHARDS
+    conn = get_shared_conn()
+    ensure_leases(conn)
+    start = zlib.crc32(WORKER_ID.encode()) % shards
+    ran = 0
+    for offset in range(shards):
+        index = (start + offset) % shards
+        if not claim_lease(conn, name, index):
+            log.info("[SHARD] %s shard %s/%s is leased by another worker, skipping", name, index, shards)
+            continue
+        log.info("[SHARD] %s: %s running shard %s/%s", name, WORKER_ID, index, shards)
+        SHARD = (index, shards)
+        LEASE = (name, index)
+        try:
+            emailer()
+        except LeaseLost as e:
+            log.warning("[SHARD] %s: lease lost mid-run (%s), leaving the shard to its new owner", name, e)
+            METRICS.incr("leases_lost", job=name)
+            continue
+        finally:
+            SHARD = None
+            LEASE = None
+        finish_lease(conn, name, index)
+        METRICS.incr("shards_run", job=name)
+        ran += 1
+    log.info("[SHARD] %s: ran %s of %s shard(s)", name, ran, shards)
+
+# ============================================================================
+# QUERIES & INDEXES - The batch emailers' hot queries, the indexes they rely on (`migrate` creates them)
+# and an EXPLAIN self-check (`check` / --check) that warns when a query falls back to a full scan or filesort.
+# ============================================================================
+# Faculty plan scan - ordered to match idx_pos_status_id, so MySQL reads the index backwards without a filesort
+FACULTY_PLANS_SQL = """
+    SELECT 
+        p.pos_id,
+        p.pid,
+        p.pos_type,
+        p.committee_chair,
+        p.current_status,
+        (
+            SELECT h.history_id FROM POS_History h
+            WHERE h.plan_of_study = p.pos_id
+            ORDER BY h.date_changed DESC, h.history_id DESC
+            LIMIT 1
+        ) AS history_id
+    FROM POS_PlanOfStudy p
+    WHERE 
+        p.current_status IN (2, 3, 4, 5)
+        {scope_sql}
+    ORDER BY p.current_status DESC, p.pos_id DESC
+"""
+
+# Student eligibility - one round-trip per keyset page, joining each plan to its most recent POS_History row
+STUDENT_ELIGIBLE_SQL = """
+    SELECT 
+        p.pos_id,
+        p.pid,
+        p.current_status,
+        h.history_id,
+        h.date_changed
+    FROM POS_PlanOfStudy p
+    LEFT JOIN POS_History h ON h.history_id = (
+        SELECT h2.history_id FROM POS_History h2
+        WHERE h2.plan_of_study = p.pos_id
+        ORDER BY h2.date_changed DESC, h2.history_id DESC
+        LIMIT 1
+    )
+    WHERE
+        p.current_status IN (6, 99)
+        AND (
+            (p.current_status = 99 AND h.history_status = 99 AND h.date_changed >= %s)
+            OR (p.current_status = 6 AND h.history_status = 6 AND h.date_changed >= %s)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM {ledger_table} l
+            WHERE l.pos_id = p.pos_id
+                AND l.status = p.current_status
+                AND l.history_id = COALESCE(h.history_id, 0)
+                AND l.recipient = p.pid
+        )
+        {scope_sql}
+        {shard_sql}
+        {keyset_sql}
+    ORDER BY p.pos_id DESC
+    LIMIT %s
+"""
+
+# (table, index name, columns) - composite/covering indexes for the queries above
+EMAILER_INDEXES = [
+    ("POS_PlanOfStudy", "idx_pos_status_id", "current_status, pos_id"),
+    ("POS_History", "idx_history_plan_date", "plan_of_study, date_changed, history_id"),
+    ("Faculty", "idx_faculty_permissions", "permissions, pid, email"),
+]
+
+def ensure_indexes(conn):
+    """Create any missing emailer indexes - returns the names created"""
+    import mysql.connector
+    cursor = conn.cursor()
+    created = []
+    for table, name, columns in EMAILER_INDEXES:
+        try:
+            with METRICS.timer("db_query", query="create_index"):
+                cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+            created.append(name)
+            log.info("[MIGRATE] Created index %s on %s (%s)", name, table, columns)
+        except mysql.connector.Error as e:
+            if getattr(e, "errno", None) != 1061:  # ER_DUP_KEYNAME - already there
+                raise
+            log.debug("[MIGRATE] Index %s on %s already exists", name, table)
+    conn.commit()
+    cursor.close()
+    return created
+
+def check_queries():
+    """(name, sql, params, tolerated) for every hot query, with representative parameters"""
+    return [
+        ("faculty_plans", FACULTY_PLANS_SQL.format(scope_sql=""), (), ()),
+        # Two status ranges merged by pos_id - a LIMITed sort over the (small) status 6/99 set is expected
+        ("student_eligible", STUDENT_ELIGIBLE_SQL.format(ledger_table=LEDGER_TABLE, scope_sql="", shard_sql="", keyset_sql="AND p.pos_id < %s"), (datetime.now(), datetime.now(), 0, STUDENT_BATCH_SIZE), ("Using filesort",)),
+        ("faculty_admins", "SELECT f.pid, f.email FROM Faculty f WHERE f.permissions >= 8", (), ()),
+        ("faculty_advisors", "SELECT f.pid, f.email FROM Faculty f WHERE f.permissions = 2 AND f.pid IN (%s)", ("",), ()),
+        ("user_emails", "SELECT pid, email FROM Faculty WHERE pid IN (%s)", ("",), ()),
+    ]
+
+def explain_queries(conn):
+    """EXPLAIN each hot query and warn about full table scans, filesorts and temporary tables - returns the warning count"""
+    ensure_ledger(conn)
+    cursor = conn.cursor(dictionary=True)
+    warnings = 0
+    for name, sql, params, tolerated in check_queries():
+        cursor.execute("EXPLAIN " + sql, params)
+        for row in cursor.fetchall():
+            table = row.get("table") or ""
+            extra = row.get("Extra") or ""
+            log.debug("[CHECK] %s: table=%s type=%s key=%s rows=%s extra=%s", name, table, row.get("type"), row.get("key"), row.get("rows"), extra)
+            if table.startswith("<"):
+                continue  # derived/union placeholder rows
+            if row.get("type") == "ALL":
+                warnings += 1
+                log.warning("[CHECK] %s: full table scan of %s", name, table)
+            for problem in ("Using filesort", "Using temporary"):
+                if problem in extra and problem not in tolerated:
+                    warnings += 1
+                    log.warning("[CHECK] %s: %s on %s", name, problem.lower(), table)
+    cursor.close()
+    if warnings:
+        log.warning("[CHECK] %s query plan warning(s); run `pos-emailer.py migrate` to create the emailer indexes", warnings)
+    else:
+        log.info("[CHECK] All %s queries use indexes", len(check_queries()))
+    return warnings
+
+# ============================================================================
+# OUTBOX - Durable local queue (SQLite) between the DB scan and SMTP delivery.
+# With --outbox the batch emailers only render and enqueue, so a scan finishes regardless of relay health;
+# --drain (or job=drain) delivers due messages with per-message exponential backoff, per-recipient
+# retry state, dead-lettering after OUTBOX_MAX_ATTEMPTS and an optional OUTBOX_RATE limit.
+# ============================================================================
+OUTBOX = os.environ.get("OUTBOX", "0") == "1"
+OUTBOX_PATH = os.environ.get("OUTBOX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pos-emailer-outbox.sqlite3"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_SECONDS", "60"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_MAX_SECONDS", "21600"))
+# Messages per second the drain may hand to the relay, 0 = unlimited
+OUTBOX_RATE = float(os.environ.get("OUTBOX_RATE", "0"))
+# Time budget for one drain; whatever is left waits for the next run
+OUTBOX_DRAIN_SECONDS = float(os.environ.get("OUTBOX_DRAIN_SECONDS", "300"))
+# Claimed messages are hidden from other drains this long, so a crashed drain's messages come back
+OUTBOX_LEASE_SECONDS = float(os.environ.get("OUTBOX_LEASE_SECONDS", "600"))
+OUTBOX_KEEP_SENT_DAYS = float(os.environ.get("OUTBOX_KEEP_SENT_DAYS", "7"))
+
+def outbox_backoff(attempts):
+    """Seconds to wait before retry number `attempts` (1-based), doubling up to the cap"""
+    return min(OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS)
+
+class Outbox:
+    """
+    SQLite-backed queue of rendered emails. Rows are pending until sent, or dead once they run out of attempts.
+    Recipients who keep failing are held back as a whole (outbox_recipients) so one bad mailbox is not retried per message.
+    """
+
+    def __init__(self, path=None):
+        import sqlite3
+        self.path = path or OUTBOX_PATH
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                html_body TEXT NOT NULL,
+                text_body TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS outbox_recipients (
+                recipient TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                retry_at REAL NOT NULL
+            );
+        """)
+
+    def enqueue(self, emails):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO outbox (recipient, subject, html_body, text_body, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(email.to_email, email.subject, email.html_body, email.text_body, now, now) for email in emails]
+            )
+
+    def claim(self, limit):
+        """Lease up to `limit` due messages - returns [(id, Email, attempts), ...] with attempts already counted"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute("""
+                SELECT id, recipient, subject, html_body, text_body, attempts FROM outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                  AND recipient NOT IN (SELECT recipient FROM outbox_recipients WHERE retry_at > ?)
+                ORDER BY id
+                LIMIT ?
+            """, (now, now, limit)).fetchall()
+            self.conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                [(now + OUTBOX_LEASE_SECONDS, row[0]) for row in rows]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [(row[0], Email(row[1], row[2], row[3], row[4]), row[5] + 1) for row in rows]
+
+    def mark_sent(self, claimed):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                                  [(now, row_id) for row_id, _, _ in claimed])
+            self.conn.executemany("DELETE FROM outbox_recipients WHERE recipient = ?",
+                                  [(email.to_email,) for _, email, _ in claimed])
+
+    def mark_failed(self, claimed, error="send failed"):
+        """Schedule retries with backoff, dead-letter messages out of attempts - returns the dead-lettered rows"""
+        now = time.time()
+        dead = [row for row in claimed if row[2] >= OUTBOX_MAX_ATTEMPTS]
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET status = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                [("dead" if attempts >= OUTBOX_MAX_ATTEMPTS else "pending", now + outbox_backoff(attempts), error, row_id)
+                 for row_id, _, attempts in claimed]
+            )
+            # Per-recipient backoff doubles with each consecutive failure (backoff(failures) computed in SQL)
+            self.conn.executemany("""
+                INSERT INTO outbox_recipients (recipient, failures, retry_at) VALUES (?, 1, ?)
+                ON CONFLICT (recipient) DO UPDATE SET
+                    failures = failures + 1,
+                    retry_at = ? + min(? * (1 << failures), ?)
+            """, [(recipient, now + outbox_backoff(1), now, OUTBOX_BACKOFF_SECONDS, OUTBOX_BACKOFF_MAX_SECONDS)
+                  for recipient in {email.to_email for _, email, _ in claimed}])
+        return dead
+
+    def prune(self, keep_days=None):
+        keep_days = OUTBOX_KEEP_SENT_DAYS if keep_days is None else keep_days
+        with self.conn:
+            self.conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - keep_days * 86400,))
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
 
+class OutboxWriter:
+    """Drop-in for SendScheduler in --outbox mode: run() enqueues everything in one transaction instead of sending"""
+    outcome = "queued"
+
+    def __init__(self, outbox=None, owns_outbox=False):
+        self.outbox = outbox
+        self._owns_outbox = owns_outbox
+        self.queued = []  # [(email, payload), ...]
+
+    def submit(self, email, payload=None):
+        self.queued.append((email, payload))
+
+    def run(self):
+        if not self.queued:
+            return []
+        queued, self.queued = self.queued, []
+        outbox = self.outbox or Outbox()
+        try:
+            with METRICS.timer("outbox_enqueue"):
+                outbox.enqueue(email for email, _ in queued)
+            log.info("[OUTBOX] Queued %s email(s) in %s", len(queued), outbox.path)
+            return [(payload, True) for _, payload in queued]
+        except Exception as e:
+            log.error("[ERROR] Failed to queue %s email(s) in the outbox: %s", len(queued), e, exc_info=True)
+            return [(payload, False) for _, payload in queued]
+        finally:
+            if self.outbox is None:
+                outbox.close()
+
+    def close(self):
+        if self._owns_outbox:
+            self.outbox.close()
+            self.outbox = None
+
+def new_scheduler(persistent=False):
+    """
+    Where the batch emailers hand rendered mail: the outbox with --outbox, otherwise straight to SMTP.
+    A persistent scheduler keeps its SMTP sessions / outbox open across run() calls until close().
+    """
+    if OUTBOX:
+        return OutboxWriter(Outbox(), owns_outbox=True) if persistent else OutboxWriter()
+    return SendScheduler(persistent=persistent)
+
+def drain_outbox(time_budget=None, rate=None):
+    """
+    Consumer stage: send due outbox messages in chunks through a SendScheduler until the queue is empty,
+    the time budget runs out, or a whole chunk fails (relay down - leave the rest to back off).
+    """
+    time_budget = OUTBOX_DRAIN_SECONDS if time_budget is None else time_budget
+    rate = OUTBOX_RATE if rate is None else rate
+    deadline = time.monotonic() + time_budget
+    chunk_size = max(1, SMTP_CONCURRENCY * 10)
+    sent = failed = dead = 0
+    outbox = Outbox()
+    log.info("[OUTBOX] ===== DRAIN %s (budget %ss, rate %s) =====", outbox.path, time_budget, rate or "unlimited")
+    try:
+        while time.monotonic() < deadline:
+            claimed = outbox.claim(chunk_size)
+            if not claimed:
+                break
+            started = time.monotonic()
+            scheduler = SendScheduler()
+            for row in claimed:
+                scheduler.submit(row[1], row)
+            results = scheduler.run()
+            ok_rows = [row for row, ok in results if ok]
+            failed_rows = [row for row, ok in results if not ok]
+            outbox.mark_sent(ok_rows)
+            dead_rows = outbox.mark_failed(failed_rows)
+            for row_id, email, attempts in dead_rows:
+                log.error("[OUTBOX] Dead-lettered message %s to %s after %s attempts: %s", row_id, email.to_email, attempts, email.subject)
+            sent += len(ok_rows)
+            failed += len(failed_rows)
+            dead += len(dead_rows)
+            METRICS.incr("messages_sent", len(ok_rows))
+            METRICS.incr("messages_failed", len(failed_rows))
+            METRICS.incr("messages_dead", len(dead_rows))
+            if failed_rows and not ok_rows:
+                log.warning("[OUTBOX] All %s message(s) in the last chunk failed; relay looks unavailable, stopping this drain", len(failed_rows))
+                break
+            if rate:
+                pause = len(claimed) / rate - (time.monotonic() - started)
+                if pause > 0:
+                    time.sleep(pause)
+        outbox.prune()
+        log.info("[OUTBOX] ===== DRAIN COMPLETE: %s sent, %s failed (%s dead-lettered); queue now %s =====", sent, failed, dead, outbox.counts())
+    finally:
+        outbox.close()
+    return failed == 0
+
+def send_student_page(conn, plans, scheduler):
+    """Render and send (or queue) the emails for one page of eligible plans, then record them in the ledger - returns (sent, failures)"""
+    keys = []  # ledger keys of sent notifications, recorded after the page
+    failures = 0
+
+    # Render an email for each plan, then send them all through the scheduler (or queue them with --outbox)
+    log.info("[STUDENT_EMAILER] Processing %s plans...", len(plans))
+    for i, plan in enumerate(plans, 1):
+        pos_id = plan['pos_id']
+        pid = plan['pid']
+        current_status = plan['current_status']
+        status_name = STATUS_MAP.get(current_status, f"Unknown({current_status})")
+
+        log.debug("[STUDENT_EMAILER] [%s/%s] Processing POS %s, Student %s, Status %s", i, len(plans), pos_id, pid, status_name)
+        try:
+            if current_status == POS_STATUS["APPROVED"]:
+                # Query already limited approvals to a latest APPROVED history row inside the window
+                log.debug("[STUDENT_EMAILER]   Status is APPROVED (changed %s), queueing approval email...", plan['date_changed'])
+                scheduler.submit(render_student_approved(pid), (plan, "approval"))
+
+            elif current_status == POS_STATUS["REJECTED"]:
+                log.debug("[STUDENT_EMAILER]   Status is REJECTED (changed %s), queueing rejection email...", plan['date_changed'])
+                scheduler.submit(render_student_rejected(pid), (plan, "rejection"))
+
+        except Exception as e:
+            failures += 1
+            log.error("[ERROR] Failed to process POS %s for student %s: %s", pos_id, pid, e, exc_info=True)
+            continue
+
+    for (plan, kind), ok in scheduler.run():
+        METRICS.incr(f"messages_{scheduler.outcome}" if ok else "messages_failed", status=plan['current_status'])
+        if ok:
+            keys.append(ledger_key(plan, plan['pid']))
+            log.info("[SYSTEM] %s %s email to %s for POS %s", scheduler.outcome.capitalize(), kind, plan['pid'], plan['pos_id'])
+        else:
+            failures += 1
+            log.warning("[STUDENT_EMAILER]   Failed to send %s email for POS %s", kind, plan['pos_id'])
+
+    ledger_record(conn, keys)
+    return len(keys), failures
+
+@METRICS.timed("emailer", job="pos-student")
+def student_emailer():
+    """
+    Send emails to students for APPROVED or REJECTED status changes.
+    Students get simple text emails notifying them of approval or rejection.
+    """
+    log.info("[STUDENT_EMAILER] ===== START STUDENT EMAILER =====")
+    try:
+        log.info("[STUDENT_EMAILER] Connecting to database...")
+        conn = get_shared_conn()
+        pos_ids, high_water = history_changes(conn, checkpoint_name("pos-student"))
+        if pos_ids == []:
+            log.info("[SYSTEM] No student POS status changes to email")
+            return
+        scope_sql, scope_params = plan_filter(pos_ids)
+        shard_sql, shard_params = shard_filter("p.pid")
+        cursor = conn.cursor(dictionary=True)
+        
+        # Both statuses are windowed - with an empty ledger an unbounded rejection clause would email every
+        # student ever rejected on the first run
+        rejection_cutoff = datetime.now() - timedelta(hours=STUDENT_REJECTION_WINDOW_HOURS)
+        cutoff = datetime.now() - timedelta(hours=STUDENT_APPROVAL_WINDOW_HOURS)
+        name = checkpoint_name("pos-student")
+        last_seen = load_resume(conn, name)
+        deadline = time.monotonic() + STUDENT_TIME_BUDGET_SECONDS if STUDENT_TIME_BUDGET_SECONDS > 0 else None
+        log.info("[STUDENT_EMAILER] Querying REJECTED (99) plans rejected since %s and APPROVED (6) plans approved since %s (page size %s%s)...",
+                 rejection_cutoff, cutoff, STUDENT_BATCH_SIZE, f", resuming below pos_id {last_seen}" if last_seen is not None else "")
+
+        sent = 0
+        failures = 0
+        scanned = 0
+        pages = 0
+        resumed = last_seen is not None
+        complete = False
+        # Keyset pagination (pos_id < last_seen): each page is fetched, sent and recorded in the ledger before
+        # the next, so memory stays bounded by the page size however large the backlog is. One scheduler serves
+        # the whole pass, so its SMTP sessions (or outbox handle) are reused page to page.
+        scheduler = new_scheduler(persistent=True)
+        try:
+            while True:
+                keyset_sql, keyset_params = ("AND p.pos_id < %s", (last_seen,)) if last_seen is not None else ("", ())
+                with METRICS.timer("db_query", query="student_eligible"):
+                    cursor.execute(
+                        STUDENT_ELIGIBLE_SQL.format(ledger_table=LEDGER_TABLE, scope_sql=scope_sql, shard_sql=shard_sql, keyset_sql=keyset_sql),
+                        (rejection_cutoff, cutoff, *scope_params, *shard_params, *keyset_params, STUDENT_BATCH_SIZE)
+                    )
+                    plans = cursor.fetchall()
+                pages += 1
+                log.info("[STUDENT_EMAILER] Found %s plans to process in page %s", len(plans), pages)
+                if plans:
+                    renew_lease(conn)
+                    page_sent, page_failures = send_student_page(conn, plans, scheduler)
+                    sent += page_sent
+                    failures += page_failures
+                    scanned += len(plans)
+                    last_seen = plans[-1]['pos_id']
+                if len(plans) < STUDENT_BATCH_SIZE and resumed:
+                    # Finished the tail of an earlier pass - start over from the top for plans newer than where it stopped
+                    log.info("[STUDENT_EMAILER] Resumed pass reached the end, restarting from the newest plans")
+                    resumed = False
+                    last_seen = None
+                elif len(plans) < STUDENT_BATCH_SIZE:
+                    complete = True
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    log.warning("[STUDENT_EMAILER] Time budget of %ss used up after %s plans", STUDENT_TIME_BUDGET_SECONDS, scanned)
+                    break
+        finally:
+            scheduler.close()
         cursor.close()
-        conn.close()
-        print("=" * 80)
-        print(f"[STUDENT_EMAILER] ===== COMPLETE: Processed {len(keys)} student POS status changes =====")
-        print("=" * 80)
+
+        if complete:
+            save_resume(conn, name, None)
+        else:
+            save_resume(conn, name, last_seen)
+        # An unfinished pass or failed sends must be rescanned next run
+        if complete and failures == 0:
+            save_checkpoint(conn, name, high_water)
+        else:
+            log.info("[CHANGES] pos-student: keeping checkpoint (%s failure(s), pass %s)", failures, "complete" if complete else "unfinished")
+        if scanned == 0:
+            log.info("[SYSTEM] No student POS status changes to email")
+            return
+        log.info("[STUDENT_EMAILER] ===== COMPLETE: Processed %s student POS status changes =====", sent)
         
+    except LeaseLost:
+        raise
     except Exception as e:
-        print(f"[ERROR] Student emailer failed: {e}")
-        print(f"[ERROR] Traceback: {traceback.format_exc()}")
+        log.error("[ERROR] Student emailer failed: %s", e, exc_info=True)
 
+def scan_faculty_plans(conn, scope_sql="", scope_params=(), query="faculty_plans"):
+    """
+    Stream the faculty plan scan, grouping plans by status and indexing status 3 plans by committee chair
+    in one pass over the rows. Returns (plans_by_status, plans_by_chair, plan_count).
+    """
+    # Unbuffered tuple cursor for the plan scan - rows are read FACULTY_FETCH_SIZE at a time
+    scan_cursor = conn.cursor(buffered=False)
+    plans_by_status = {}
+    plans_by_chair = {}
+    plan_count = 0
+    try:
+        with METRICS.timer("db_query", query=query):
+            scan_cursor.execute(FACULTY_PLANS_SQL.format(scope_sql=scope_sql), scope_params)
+            for plan in fetch_plan_rows(scan_cursor):
+                plan_count += 1
+                plans_by_status.setdefault(plan.current_status, []).append(plan)
+                if plan.current_status == POS_STATUS["PENDING_FACULTY"] and plan.committee_chair:
+                    plans_by_chair.setdefault(plan.committee_chair, []).append(plan)
+    finally:
+        # A failure mid-stream leaves unread rows on the shared connection ("Unread result found" for the
+        # next emailer in an `all` run) - discard whatever is left, then close the cursor
+        try:
+            conn.consume_results()
+            scan_cursor.close()
+        except Exception as e:
+            log.debug("[FACULTY_EMAILER] Could not clean up the plan scan cursor: %s", e)
+    # Rows arrive grouped by status (index order); handle statuses lowest first
+    return dict(sorted(plans_by_status.items())), plans_by_chair, plan_count
+
+@METRICS.timed("emailer", job="faculty")
 def faculty_emailer():
     """
     Send emails to faculty for specific POS statuses.
@@ -420,149 +1812,590 @@ def faculty_emailer():
     - Status 3: Faculty with permissions = 2 (Grad_Advisor)
     Faculty receives an HTML email with a list of all POS entries in that status.
     """
-    print("=" * 80)
-    print("[FACULTY_EMAILER] ===== START FACULTY EMAILER =====")
-    print("=" * 80)
+    log.info("[FACULTY_EMAILER] ===== START FACULTY EMAILER =====")
+    scheduler = None
     try:
-        print("[FACULTY_EMAILER] Connecting to database...")
-        conn = get_db_conn()
-        cursor = conn.cursor(dictionary=True)
+        log.info("[FACULTY_EMAILER] Connecting to database...")
+        conn = get_shared_conn()
+        pos_ids, high_water = history_changes(conn, checkpoint_name("faculty"))
+        if pos_ids == []:
+            log.info("[SYSTEM] No faculty POS status changes to email")
+            return
+        scope_sql, scope_params = plan_filter(pos_ids)
         
         # Query to get POS plans that need faculty review
-        print("[FACULTY_EMAILER] Querying POS plans with statuses 2 (PENDING_GRADUATE_COORDINATOR), 3 (PENDING_FACULTY), 4 (AWAITING_KEY), 5 (PENDING_GRADUATE_SCHOOL)...")
-        cursor.execute("""
-            SELECT 
-                p.pos_id,
-                p.pid,
-                p.pos_type,
-                p.committee_chair,
-                p.current_status
-            FROM POS_PlanOfStudy p
-            WHERE 
-                p.current_status IN (2, 3, 4, 5)
-            ORDER BY p.pos_id DESC
-        """)
-        
-        plans = cursor.fetchall()
-        print(f"[FACULTY_EMAILER] Found {len(plans)} plans to process")
+        log.info("[FACULTY_EMAILER] Querying POS plans with statuses 2 (PENDING_GRADUATE_COORDINATOR), 3 (PENDING_FACULTY), 4 (AWAITING_KEY), 5 (PENDING_GRADUATE_SCHOOL)...")
+        plans_by_status, plans_by_chair, plan_count = scan_faculty_plans(conn, scope_sql, scope_params)
+        if pos_ids is not None and plan_count:
+            # Incremental run: the changed plans only pick which statuses (and chairs) to notify - each
+            # notification still lists everything pending in that status, so rescan those statuses in full
+            changed_chairs = set(plans_by_chair)
+            statuses = list(plans_by_status)
+            log.info("[FACULTY_EMAILER] %s changed plans in statuses %s, loading their full pending lists...", plan_count, statuses)
+            plans_by_status, plans_by_chair, plan_count = scan_faculty_plans(
+                conn, f"AND p.current_status IN ({', '.join(['%s'] * len(statuses))})", tuple(statuses), query="faculty_pending"
+            )
+            plans_by_chair = {chair: plans for chair, plans in plans_by_chair.items() if chair in changed_chairs}
+        log.info("[FACULTY_EMAILER] Found %s plans to process", plan_count)
         
-        if len(plans) == 0:
-            print("[SYSTEM] No faculty POS status changes to email")
-            cursor.close()
-            conn.close()
+        if plan_count == 0:
+            log.info("[SYSTEM] No faculty POS status changes to email")
+            save_checkpoint(conn, checkpoint_name("faculty"), high_water)
             return
         
-        # Organize plans by status
-        print("[FACULTY_EMAILER] Organizing plans by status...")
-        plans_by_status = {}
-        for plan in plans:
-            status_id = plan['current_status']
-            if status_id not in plans_by_status:
-                plans_by_status[status_id] = []
-            plans_by_status[status_id].append(plan)
-        
-        print(f"[FACULTY_EMAILER] Found plans for statuses: {list(plans_by_status.keys())}")
+        cursor = conn.cursor(dictionary=True)
+        log.info("[FACULTY_EMAILER] Found plans for statuses: %s", list(plans_by_status.keys()))
         for status_id, status_plans in plans_by_status.items():
-            print(f"[FACULTY_EMAILER]   Status {status_id} ({STATUS_MAP.get(status_id, 'Unknown')}): {len(status_plans)} plans")
+            log.debug("[FACULTY_EMAILER]   Status %s (%s): %s plans", status_id, STATUS_MAP.get(status_id, 'Unknown'), len(status_plans))
+        
+        failures = 0
+        # Persistent so the per-status flushes below share SMTP sessions
+        scheduler = new_scheduler(persistent=True)
+        digests = {}  # digest mode: faculty_pid -> [(status_id, plans_to_send, plan_keys), ...]
+
+        def flush():
+            """Send everything queued, record the sent notifications in the ledger, return the failure count"""
+            keys = []
+            flush_failures = 0
+            for (faculty_pid, status_id, plan_keys), ok in scheduler.run():
+                METRICS.incr(f"messages_{scheduler.outcome}" if ok else "messages_failed", status=status_id)
+                if ok:
+                    keys.extend(plan_keys)
+                    log.info("[SYSTEM] %s %s notification to %s (%s) for %s POS entries", scheduler.outcome.capitalize(), status_id, faculty_pid, get_user_email(faculty_pid), len(plan_keys))
+                else:
+                    flush_failures += 1
+                    log.warning("[FACULTY_EMAILER]     Failed to send email to faculty %s", faculty_pid)
+            ledger_record(conn, keys)
+            return flush_failures
         
-        keys = []  # list of pos_ids for update
+        # Sharded runs only notify faculty whose pid hashes to this shard
+        shard_sql, shard_params = shard_filter("f.pid")
         
         # Determine which faculty to notify based on status
         for status_id, status_plans in plans_by_status.items():
-            print(f"[FACULTY_EMAILER] Processing status {status_id} with {len(status_plans)} plans...")
+            log.info("[FACULTY_EMAILER] Processing status %s with %s plans...", status_id, len(status_plans))
+            # Sharded runs: confirm the shard is still ours before notifying anyone about this status
+            renew_lease(conn)
             try:
                 # Determine permission requirements
+                permission_params = ()
                 if status_id == POS_STATUS["PENDING_FACULTY"]:
-                    # Only Grad_Advisors (permission = 2)
-                    permission_query = "SELECT f.pid, f.email FROM Faculty f WHERE f.permissions = 2"
-                    print(f"[FACULTY_EMAILER]   Status {status_id} (PENDING_FACULTY) - querying faculty with permission = 2 (Grad_Advisor)")
+                    # plans_by_chair was built during the scan; only chairs with pending plans are notified
+                    if not plans_by_chair:
+                        log.debug("[FACULTY_EMAILER]   Status %s (PENDING_FACULTY) - no plans have a committee chair, skipping", status_id)
+                        continue
+                    # Only Grad_Advisors (permission = 2) who chair one of these plans
+                    placeholders = ", ".join(["%s"] * len(plans_by_chair))
+                    permission_query = f"SELECT f.pid, f.email FROM Faculty f WHERE f.permissions = 2 AND f.pid IN ({placeholders}) {shard_sql}"
+                    permission_params = (*plans_by_chair, *shard_params)
+                    log.debug("[FACULTY_EMAILER]   Status %s (PENDING_FACULTY) - querying %s committee chairs with permission = 2 (Grad_Advisor)", status_id, len(plans_by_chair))
                 
                 elif status_id in [POS_STATUS["PENDING_GRADUATE_COORDINATOR"], 
                                    POS_STATUS["AWAITING_KEY"], 
                                    POS_STATUS["PENDING_GRADUATE_SCHOOL"]]:
                     # Admin/Coordinator level (permissions >= 8)
-                    permission_query = "SELECT f.pid, f.email FROM Faculty f WHERE f.permissions >= 8"
+                    permission_query = f"SELECT f.pid, f.email FROM Faculty f WHERE f.permissions >= 8 {shard_sql}"
+                    permission_params = shard_params
                     status_name = STATUS_MAP.get(status_id, f"Status {status_id}")
-                    print(f"[FACULTY_EMAILER]   Status {status_id} ({status_name}) - querying faculty with permission >= 8")
+                    log.debug("[FACULTY_EMAILER]   Status %s (%s) - querying faculty with permission >= 8", status_id, status_name)
                 else:
-                    print(f"[FACULTY_EMAILER]   Status {status_id} - not configured for faculty notification, skipping")
+                    log.debug("[FACULTY_EMAILER]   Status %s - not configured for faculty notification, skipping", status_id)
                     continue
                 
-                print(f"[FACULTY_EMAILER]   Executing permission query...")
-                cursor.execute(permission_query)
-                faculty_members = cursor.fetchall()
-                print(f"[FACULTY_EMAILER]   Found {len(faculty_members)} eligible faculty members")
+                log.debug("[FACULTY_EMAILER]   Executing permission query...")
+                with METRICS.timer("db_query", query="faculty_permissions"):
+                    cursor.execute(permission_query, permission_params)
+                    faculty_members = cursor.fetchall()
+                # Permission query already returned f.email - reuse it instead of one lookup per send
+                prime_user_emails(faculty_members)
+                log.debug("[FACULTY_EMAILER]   Found %s eligible faculty members", len(faculty_members))
                 
                 if not faculty_members:
-                    print(f"[WARNING] No faculty found for status {status_id}")
+                    log.warning("[WARNING] No faculty found for status %s", status_id)
                     continue
                 
-                # Send email to each eligible faculty member
-                print(f"[FACULTY_EMAILER]   Sending notification emails to {len(faculty_members)} faculty members...")
-                for i, faculty in enumerate(faculty_members, 1):
-                    faculty_pid = faculty['pid']
-                    print(f"[FACULTY_EMAILER]   [{i}/{len(faculty_members)}] Notifying faculty {faculty_pid}...")
+                # Route plans to faculty: status 3 goes to each chair's own plans, statuses 2, 4, 5 send all plans
+                if status_id == POS_STATUS["PENDING_FACULTY"]:
+                    # f.pid IN (...) matches case-insensitively in MySQL, the dict lookup does not - skip
+                    # (rather than KeyError out of) any chair whose pid differs only in case
+                    routes = []
+                    for faculty in faculty_members:
+                        chair_plans = plans_by_chair.get(faculty['pid'])
+                        if chair_plans is None:
+                            log.warning("[WARNING] Committee chair %s matched no plans exactly (pid case differs?), skipping", faculty['pid'])
+                            continue
+                        routes.append((faculty['pid'], chair_plans))
+                else:
+                    routes = [(faculty['pid'], status_plans) for faculty in faculty_members]
+                
+                # One ledger lookup for every routed (plan, faculty) pair in this status
+                already_sent = ledger_sent(conn, [
+                    ledger_key(plan, faculty_pid) for faculty_pid, plans_to_send in routes for plan in plans_to_send
+                ])
+                
+                # Queue an email for each eligible faculty member
+                log.debug("[FACULTY_EMAILER]   Queueing notification emails for %s faculty members...", len(routes))
+                for i, (faculty_pid, plans_to_send) in enumerate(routes, 1):
+                    log.debug("[FACULTY_EMAILER]   [%s/%s] Notifying faculty %s about %s plans...", i, len(routes), faculty_pid, len(plans_to_send))
                     try:
-                        # Filter plans based on status
-                        if status_id == POS_STATUS["PENDING_FACULTY"]:
-                            # For status 3, only send plans where this faculty is the committee chair
-                            filtered_plans = [plan for plan in status_plans if plan['committee_chair'] == faculty_pid]
-                            print(f"[FACULTY_EMAILER]     Filtered {len(status_plans)} plans to {len(filtered_plans)} where faculty is committee chair")
-                            if not filtered_plans:
-                                print(f"[FACULTY_EMAILER]     No relevant plans for {faculty_pid}, skipping")
-                                continue
-                            plans_to_send = filtered_plans
-                        else:
-                            # For statuses 2, 4, 5, send all plans to all eligible faculty
-                            plans_to_send = status_plans
+                        plan_keys = [ledger_key(plan, faculty_pid) for plan in plans_to_send]
+                        if all(key in already_sent for key in plan_keys):
+                            log.debug("[FACULTY_EMAILER]     %s was already notified about all %s plans, skipping", faculty_pid, len(plans_to_send))
+                            continue
+                        
+                        if FACULTY_DIGEST:
+                            # Sent later as one message per faculty member across all statuses
+                            digests.setdefault(faculty_pid, []).append((status_id, plans_to_send, plan_keys))
+                            continue
                         
-                        # faculty_notification_email expects (faculty_pid, pos_entries, status)
-                        if faculty_notification_email(faculty_pid, plans_to_send, status_id):
-                            faculty_email = get_user_email(faculty_pid)
-                            print(f"[SYSTEM] Sent {status_id} notification to {faculty_pid} ({faculty_email}) for {len(plans_to_send)} POS entries")
-                        else:
-                            print(f"[FACULTY_EMAILER]     Failed to send email to faculty {faculty_pid}")
+                        # render_faculty_notification expects (faculty_pid, pos_entries, status)
+                        faculty_email = get_user_email(faculty_pid)
+                        scheduler.submit(
+                            render_faculty_notification(faculty_pid, plans_to_send, status_id, faculty_email),
+                            (faculty_pid, status_id, plan_keys)
+                        )
                     
                     except Exception as e:
-                        print(f"[ERROR] Failed to send email to faculty {faculty_pid}: {e}")
-                        print(f"[ERROR] Traceback: {traceback.format_exc()}")
+                        failures += 1
+                        log.error("[ERROR] Failed to send email to faculty %s: %s", faculty_pid, e, exc_info=True)
                         continue
                 
             except Exception as e:
-                print(f"[ERROR] Failed to process status {status_id}: {e}")
-                print(f"[ERROR] Traceback: {traceback.format_exc()}")
+                failures += 1
+                log.error("[ERROR] Failed to process status %s: %s", status_id, e, exc_info=True)
                 continue
+            finally:
+                # Send and ledger each status before the next heartbeat (digests go out together at the end)
+                if not FACULTY_DIGEST:
+                    failures += flush()
+        
+        if digests:
+            renew_lease(conn)
+            log.info("[FACULTY_EMAILER] Queueing digests for %s faculty members...", len(digests))
+        for faculty_pid, sections in digests.items():
+            try:
+                scheduler.submit(
+                    render_faculty_digest(faculty_pid, [(status_id, plans) for status_id, plans, _ in sections], get_user_email(faculty_pid)),
+                    (faculty_pid, "/".join(str(status_id) for status_id, _, _ in sections), [key for _, _, plan_keys in sections for key in plan_keys])
+                )
+            except Exception as e:
+                failures += 1
+                log.error("[ERROR] Failed to build digest for faculty %s: %s", faculty_pid, e, exc_info=True)
+        
+        failures += flush()
+        if failures == 0:
+            save_checkpoint(conn, checkpoint_name("faculty"), high_water)
+        else:
+            log.info("[CHANGES] faculty: keeping checkpoint (%s failure(s))", failures)
         cursor.close()
-        conn.close()
-        print("=" * 80)
-        print(f"[FACULTY_EMAILER] ===== COMPLETE: Processed faculty notifications =====")
-        print("=" * 80)
+        log.info("[FACULTY_EMAILER] ===== COMPLETE: Processed faculty notifications =====")
         
+    except LeaseLost:
+        raise
     except Exception as e:
-        print(f"[ERROR] Faculty emailer failed: {e}")
-        print(f"[ERROR] Traceback: {traceback.format_exc()}")
+        log.error("[ERROR] Faculty emailer failed: %s", e, exc_info=True)
+    finally:
+        if scheduler is not None:
+            scheduler.close()
 
 # ============================================================================
-# MAIN EXECUTION - Routes to appropriate emailer based on JOB environment variable
+# EVENT HANDLERS - Per status-change functions called by node/database/helpers/pos_change_tracker.js
+# Argument order matches the callPythonEmailer(functionName, args) calls there.
 # ============================================================================
-print("=" * 80)
-print("[MAIN] Starting job routing...")
-job_type = os.getenv("job", "none")
-print(f"[MAIN] JOB environment variable: '{job_type}'")
-print("=" * 80)
-
-match job_type:
-    case "faculty":
-        print("[MAIN] Running FACULTY emailer only")
-        faculty_emailer()
-    case "pos-student":
-        print("[MAIN] Running STUDENT emailer only")
-        student_emailer()
-    case _:
-        print(f'[MAIN] No valid "job" provided (got "{job_type}"), running both emailers!')
-        faculty_emailer()
-        student_emailer()
-
-print("=" * 80)
-print("[MAIN] ===== pos-emailer.py COMPLETE =====")
-print("=" * 80)
\ No newline at end of file
+def get_plan(pos_id):
+    """Fetch the POS row used in faculty notification tables"""
+    cursor = get_shared_conn().cursor(dictionary=True)
+    try:
+        with METRICS.timer("db_query", query="plan"):
+            cursor.execute("""
+                SELECT p.pos_id, p.pid, p.pos_type, p.committee_chair, p.current_status,
+                    (
+                        SELECT h.history_id FROM POS_History h
+                        WHERE h.plan_of_study = p.pos_id
+                        ORDER BY h.date_changed DESC, h.history_id DESC
+                        LIMIT 1
+                    ) AS history_id
+                FROM POS_PlanOfStudy p
+                WHERE p.pos_id = %s
+            """, (pos_id,))
+            return cursor.fetchone()
+    finally:
+        cursor.close()
+
+def _notify_faculty_of_plan(pos_id, faculty_pids):
+    # Node passes an undefined advisorPID as null - never mail "None@vt.edu"
+    faculty_pids = [pid for pid in faculty_pids or [] if pid]
+    if not faculty_pids:
+        log.warning("[EVENT] No faculty to notify about POS %s (empty pid list)", pos_id)
+        return True
+    plan = get_plan(pos_id)
+    if not plan:
+        log.debug("[EVENT] POS %s not found, nothing to send", pos_id)
+        return False
+    conn = get_shared_conn()
+    emails = get_user_emails(faculty_pids, conn)
+    already_sent = ledger_sent(conn, [ledger_key(plan, pid) for pid in emails])
+    ok = True
+    sent = []
+    for faculty_pid, faculty_email in emails.items():
+        key = ledger_key(plan, faculty_pid)
+        if key in already_sent:
+            log.debug("[EVENT] %s was already notified about POS %s, skipping", faculty_pid, pos_id)
+        elif faculty_notification_email(faculty_pid, [plan], plan['current_status'], faculty_email):
+            sent.append(key)
+        else:
+            ok = False
+    ledger_record(conn, sent)
+    return ok
+
+def _notify_student_of_decision(student_pid, pos_id, status, send):
+    """
+    Send a student decision email once per plan status change, recording it so the batch run skips it.
+    Only deduped while the plan is actually in the decision's status - otherwise (e.g. the plan moved on)
+    the email is sent without touching the ledger, so no key is recorded for a status the event wasn't about.
+    """
+    plan = get_plan(pos_id) if pos_id is not None else None
+    if plan is None or plan['current_status'] != status:
+        return send()
+    conn = get_shared_conn()
+    key = ledger_key(plan, student_pid)
+    if ledger_sent(conn, [key]):
+        log.debug("[EVENT] %s was already notified about POS %s, skipping", student_pid, pos_id)
+        return True
+    if not send():
+        return False
+    ledger_record(conn, [key])
+    return True
+
+def pos_submitted_for_review_email(pos_id, student_pid, advisor_pid):
+    return _notify_faculty_of_plan(pos_id, [advisor_pid])
+
+def pos_ready_for_committee_email(pos_id, student_pid, committee_pids):
+    return _notify_faculty_of_plan(pos_id, committee_pids)
+
+def pos_approved_email(student_pid, pos_id=None):
+    return _notify_student_of_decision(student_pid, pos_id, POS_STATUS["APPROVED"], lambda: student_approved_email(student_pid))
+
+def pos_requires_revision_email(student_pid, pos_id=None, note=None, changed_by=None, feedback=False):
+    if feedback:
+        # Revision feedback (onPOSFeedback) leaves the status alone and may repeat - always send, never ledger
+        return student_rejected_email(student_pid, note)
+    return _notify_student_of_decision(student_pid, pos_id, POS_STATUS["REJECTED"], lambda: student_rejected_email(student_pid, note))
+
+def pos_admin_notification_email(decision, student_pid, pos_id, admin_pids):
+    emails = get_user_emails(admin_pids or [], get_shared_conn())
+    ok = True
+    for admin_pid, admin_email in emails.items():
+        ok = admin_decision_email(admin_pid, decision, student_pid, pos_id, admin_email) and ok
+    return ok
+
+def pos_status_changed_email(student_pid, old_status_name, new_status_name, _status_label=None, note=None):
+    return student_status_changed_email(student_pid, old_status_name, new_status_name, note)
+
+EVENT_HANDLERS = {
+    "pos_submitted_for_review_email": pos_submitted_for_review_email,
+    "pos_ready_for_committee_email": pos_ready_for_committee_email,
+    "pos_approved_email": pos_approved_email,
+    "pos_requires_revision_email": pos_requires_revision_email,
+    "pos_admin_notification_email": pos_admin_notification_email,
+    "pos_status_changed_email": pos_status_changed_email,
+}
+
+def dispatch_event(function_name, args):
+    """Run one named event handler - returns True on success"""
+    handler = EVENT_HANDLERS.get(function_name)
+    if handler is None:
+        log.warning("[EVENT] Unknown function '%s'", function_name)
+        return False
+    if not isinstance(args, list):
+        args = [args]
+    log.debug("[EVENT] %s%s", function_name, tuple(args))
+    try:
+        with METRICS.timer("event", function=function_name):
+            ok = bool(handler(*args))
+        METRICS.incr("events_ok" if ok else "events_failed", function=function_name)
+        return ok
+    except Exception as e:
+        METRICS.incr("events_failed", function=function_name)
+        log.error("[ERROR] Event %s failed: %s", function_name, e, exc_info=True)
+        return False
+
+# --serve holds events this long before dispatching so a burst for the same plan or student collapses
+# into one notification about the latest status; 0 dispatches every event as it arrives
+EVENT_DEBOUNCE_SECONDS = float(os.environ.get("EVENT_DEBOUNCE_SECONDS", "2"))
+
+FACULTY_EVENTS = ("pos_submitted_for_review_email", "pos_ready_for_committee_email")
+STUDENT_EVENTS = ("pos_approved_email", "pos_requires_revision_email", "pos_status_changed_email")
+
+def coalesce_key(function_name, args):
+    """
+    Debounce key for an event - a later event with the same key supersedes the earlier one.
+    Faculty and admin notifications are keyed by plan (they always render the plan's current status),
+    student decisions by student and plan, so one plan's decision never swallows another's.
+    pos_status_changed_email carries no pos_id and is keyed by the student alone.
+    None means the event is never coalesced.
+    """
+    try:
+        if function_name in FACULTY_EVENTS:
+            return ("faculty", args[0])
+        if function_name == "pos_admin_notification_email":
+            return ("admin", args[2])
+        if function_name == "pos_status_changed_email":
+            return ("student", args[0])
+        if function_name == "pos_requires_revision_email" and len(args) > 4 and args[4]:
+            return None  # each revision-feedback note is its own email
+        if function_name in STUDENT_EVENTS:
+            return ("student", args[0], args[1] if len(args) > 1 else None)
+    except (IndexError, TypeError):
+        pass
+    return None
+
+def _faculty_recipients(function_name, args):
+    if function_name == "pos_submitted_for_review_email":
+        pids = [args[2]]
+    else:
+        pids = list(args[2] or [])
+    return [pid for pid in pids if pid]
+
+def merge_events(old, new):
+    """Combine two events with the same key: the newer one wins, keeping recipients of the superseded one"""
+    (old_function, old_args), (function_name, args) = old, new
+    if function_name in FACULTY_EVENTS:
+        pids = _faculty_recipients(old_function, old_args) + _faculty_recipients(function_name, args)
+        return "pos_ready_for_committee_email", [args[0], args[1], list(dict.fromkeys(pids))]
+    if function_name == "pos_admin_notification_email":
+        pids = list(old_args[3] or []) + list(args[3] or [])
+        return function_name, [*args[:3], list(dict.fromkeys(pids))]
+    return function_name, args
+
+class EventDebouncer:
+    """Collects events for one window, collapsing superseded ones, then dispatches what is left in arrival order"""
+
+    def __init__(self, window=None):
+        self.window = EVENT_DEBOUNCE_SECONDS if window is None else window
+        self.pending = {}  # key -> [function_name, args, [(event_id, function_name), ...]]
+        self.deadline = None
+        self._unkeyed = 0
+
+    def add(self, event_id, function_name, args):
+        if not isinstance(args, list):
+            args = [args]
+        key = coalesce_key(function_name, args)
+        if key is None:
+            self._unkeyed += 1
+            key = ("event", self._unkeyed)
+        entry = self.pending.get(key)
+        if entry is None:
+            self.pending[key] = [function_name, args, [(event_id, function_name)]]
+        else:
+            entry[0], entry[1] = merge_events((entry[0], entry[1]), (function_name, args))
+            entry[2].append((event_id, function_name))
+            METRICS.incr("events_coalesced", function=function_name)
+            log.debug("[SERVE] Coalesced %s into pending %s for %s", function_name, entry[0], key)
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.window
+
+    def timeout(self):
+        """Seconds until the window closes, or None when nothing is pending"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def flush(self):
+        """Dispatch the pending events - returns result dicts for every event received in the window"""
+        pending, self.pending, self.deadline = self.pending, {}, None
+        results = []
+        for function_name, args, received in pending.values():
+            ok = dispatch_event(function_name, args)
+            for event_id, received_function in received:
+                result = {"id": event_id, "function": received_function, "ok": ok}
+                if len(received) > 1:
+                    result["coalesced"] = len(received)
+                results.append(result)
+        if len(results) > len(pending):
+            log.info("[SERVE] Flushed %s event(s) as %s notification(s)", len(results), len(pending))
+        return results
+
+def _print_result(result):
+    print(f"[RESULT] {json.dumps(result)}")
+    sys.stdout.flush()
+
+def serve(stream=sys.stdin, window=None):
+    """
+    Resident mode - read JSON-lines events {"id": ..., "function": ..., "args": [...]} until EOF.
+    Events are debounced (EVENT_DEBOUNCE_SECONDS) and each gets a "[RESULT] {json}" line back on stdout once
+    its window is flushed; DB and SMTP connections stay open between events.
+    """
+    global EMAIL_CACHE_TTL
+    if "EMAIL_CACHE_TTL" not in os.environ:
+        # Faculty emails can change while we stay resident; refresh cached lookups every few minutes
+        EMAIL_CACHE_TTL = 300
+    import queue
+    debouncer = EventDebouncer(window)
+    # Read stdin on a thread so the window can close while no new lines arrive
+    lines = queue.Queue()
+    def read_lines():
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+    threading.Thread(target=read_lines, name="stdin", daemon=True).start()
+
+    log.info("[SERVE] Waiting for events on stdin (debounce window %ss)...", debouncer.window)
+    sys.stdout.flush()
+    while True:
+        try:
+            line = lines.get(timeout=debouncer.timeout())
+        except queue.Empty:
+            line = ""
+        if line is None:
+            break
+        line = line.strip()
+        if line:
+            try:
+                event = json.loads(line)
+                debouncer.add(event.get("id"), event.get("function"), event.get("args", []))
+            except Exception as e:
+                log.error("[ERROR] Bad event line %r: %s", line, e)
+                _print_result({"id": None, "ok": False, "error": str(e)})
+        if debouncer.timeout() == 0:
+            for result in debouncer.flush():
+                _print_result(result)
+    for result in debouncer.flush():
+        _print_result(result)
+    log.info("[SERVE] stdin closed, shutting down")
+
+# ============================================================================
+# MAIN - `pos-emailer.py [options] COMMAND`: faculty, pos-student, all, drain, serve or one of the
+# EVENT_HANDLERS. Without a command the older interface still works: --serve, --function/--args,
+# or the JOB environment variable (faculty / pos-student / drain, anything else runs both emailers).
+# ============================================================================
+BATCH_COMMANDS = {
+    "faculty": "run the faculty emailer",
+    "pos-student": "run the student emailer",
+    "all": "run both batch emailers",
+    "drain": "deliver due outbox messages only",
+    "migrate": "create the indexes the emailer queries rely on",
+    "check": "EXPLAIN the emailer queries and warn about full scans / filesorts",
+    "serve": "stay resident and read JSON-lines events from stdin",
+}
+
+def _event_arg(value):
+    """Positional event arguments are JSON when they parse (12, null, ["a","b"]), plain strings otherwise"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="SAACS Plan of Study emailer")
+    parser.add_argument("--function", help="event handler to run once, e.g. pos_approved_email (same as the COMMAND form)")
+    parser.add_argument("--args", default="[]", help="JSON array of arguments for --function or an event COMMAND")
+    parser.add_argument("--serve", action="store_true", help="same as the serve COMMAND")
+    parser.add_argument("--incremental", action="store_true", help="only scan plans with POS_History rows since the last run")
+    parser.add_argument("--full-rescan", action="store_true", help="ignore the saved checkpoint and scan every plan")
+    parser.add_argument("--outbox", action="store_true", help="batch emailers queue rendered mail in the local outbox instead of sending it")
+    parser.add_argument("--drain", action="store_true", help="deliver due outbox messages after the batch emailers")
+    parser.add_argument("--shards", type=int, help="split batch jobs into N recipient shards claimed through DB leases (default: EMAILER_SHARDS or 1)")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN the emailer queries at startup and log plan warnings")
+    parser.add_argument("--digest", action="store_true", help="send each faculty member one email covering all pending statuses")
+    parser.add_argument("--log-level", help="DEBUG, INFO, WARNING or ERROR (default: LOG_LEVEL or INFO)")
+    parser.add_argument("--log-format", choices=["text", "json"], help="log line format (default: LOG_FORMAT or text)")
+    parser.add_argument("--quiet", action="store_true", help="production mode - only warnings and errors")
+    parser.add_argument("--metrics-file", default=os.environ.get("METRICS_FILE"), help="write run metrics here (.prom = Prometheus textfile, else JSON)")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    for name, help_text in BATCH_COMMANDS.items():
+        commands.add_parser(name, help=help_text)
+    for name, handler in EVENT_HANDLERS.items():
+        command = commands.add_parser(name, help="event handler (" + ", ".join(handler.__code__.co_varnames[:handler.__code__.co_argcount]) + ")")
+        command.add_argument("event_args", nargs="*", type=_event_arg, help="handler arguments in order")
+    return parser
+
+def resolve_command(args):
+    """(command, event_args) from the subcommand, the legacy --serve/--function flags, or the JOB env variable"""
+    if args.command in EVENT_HANDLERS:
+        return args.command, args.event_args or json.loads(args.args)
+    if args.command:
+        return args.command, None
+    if args.serve:
+        return "serve", None
+    if args.function:
+        return args.function, json.loads(args.args)
+    job_type = os.getenv("job", "none")
+    log.info("[MAIN] JOB environment variable: '%s'", job_type)
+    if job_type in ("faculty", "pos-student", "all", "drain"):
+        return job_type, None
+    log.info('[MAIN] No valid "job" provided (got "%s"), running both emailers!', job_type)
+    return "all", None
+
+def run_batch(name, emailer):
+    """Run a batch emailer directly, or shard by shard when EMAILER_SHARDS > 1"""
+    if EMAILER_SHARDS > 1:
+        run_sharded(name, emailer)
+    else:
+        emailer()
+
+def run_command(command, event_args, drain=False):
+    """Run one command and return the process exit code"""
+    match command:
+        case "serve":
+            log.info("[MAIN] Running resident event server")
+            serve()
+            return 0
+        case "faculty":
+            log.info("[MAIN] Running FACULTY emailer only")
+            run_batch("faculty", faculty_emailer)
+        case "pos-student":
+            log.info("[MAIN] Running STUDENT emailer only")
+            run_batch("pos-student", student_emailer)
+        case "all":
+            run_batch("faculty", faculty_emailer)
+            run_batch("pos-student", student_emailer)
+        case "drain":
+            log.info("[MAIN] Draining the outbox only")
+            drain = True
+        case "migrate":
+            ensure_indexes(get_shared_conn())
+            return 0
+        case "check":
+            return 1 if explain_queries(get_shared_conn()) else 0
+        case _:
+            log.info("[MAIN] Running event handler %s", command)
+            return 0 if dispatch_event(command, event_args) else 1
+    if drain:
+        return 0 if drain_outbox() else 1
+    return 0
+
+def main(argv=None):
+    global FACULTY_DIGEST, INCREMENTAL, FULL_RESCAN, OUTBOX, EMAILER_SHARDS
+    args = build_parser().parse_args(argv)
+    configure_logging("WARNING" if args.quiet else args.log_level, args.log_format)
+    METRICS.observe("startup", time.perf_counter() - _STARTED)
+    log_config()
+    FACULTY_DIGEST = FACULTY_DIGEST or args.digest
+    INCREMENTAL = INCREMENTAL or args.incremental
+    FULL_RESCAN = args.full_rescan
+    OUTBOX = OUTBOX or args.outbox
+    EMAILER_SHARDS = args.shards or EMAILER_SHARDS
+
+    log.info("[MAIN] Starting job routing...")
+    command, event_args = resolve_command(args)
+    try:
+        if args.check and command != "check":
+            explain_queries(get_shared_conn())
+        exit_code = run_command(command, event_args, args.drain)
+    finally:
+        close_smtp_session()
+        close_shared_conn()
+
+    METRICS.log_summary()
+    if args.metrics_file:
+        try:
+            METRICS.write(args.metrics_file)
+        except OSError as e:
+            log.warning("[METRICS] Could not write %s: %s", args.metrics_file, e)
+
+    log.info("[MAIN] ===== pos-emailer.py COMPLETE =====")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,18 @@
 const Log = require("../database/utils/Log");
-const { execFile } = require("child_process");
+const { execFile, spawn } = require("child_process");
 const path = require("path");
+const readline = require("readline");
 
 // Path to Python emailer
 const POS_EMAILER_PATH = path.join(__dirname, "../../emailer/pos-emailer.py");
 
+// Keep one emailer process running and stream events to it (set POS_EMAILER_RESIDENT=false to spawn per batch)
+const POS_EMAILER_RESIDENT = process.env.POS_EMAILER_RESIDENT !== "false";
+
+// Without the resident process, events are collected for this long and handed to a single emailer process,
+// which coalesces bursts (e.g. bulk approvals, 2 -> 3 -> 4 in quick succession) before sending
+const POS_EMAILER_BATCH_MS = parseInt(process.env.POS_EMAILER_BATCH_MS || "2000", 10);
+
 // POS STATUS VALUES
 const POS_STATUS = {
     SAVED: 1,
@@ -16,6 +24,163 @@ const POS_STATUS = {
     REJECTED: 99,
 };
 
+/**
+ * Run the Python emailer once for a single event (fallback when the resident process is unavailable)
+ * @param {string} functionName - Name of function in pos-emailer.py
+ * @param {Array} args - Arguments to pass to function
+ */
+const runPythonEmailerOnce = (functionName, args) => {
+    // Run Python script asynchronously in background
+    // Don't wait for result - email failures shouldn't block the main process
+    const pythonArgs = [POS_EMAILER_PATH, "--quiet", "--function", functionName, "--args", JSON.stringify(args)];
+
+    execFile("python3", pythonArgs, { timeout: 10000 }, (error, stdout, stderr) => {
+        if (error) {
+            Log.warn(`Python emailer error for ${functionName}: ${error.message}`, "System");
+        } else if (stderr) {
+            Log.warn(`Python emailer stderr for ${functionName}: ${stderr}`, "System");
+        }
+        if (stdout) {
+            Log.info(`Python emailer output: ${stdout}`, "System");
+        }
+    });
+};
+
+let emailerProcess = null;
+let nextEventID = 1;
+
+/**
+ * Run every event an emailer process never answered with a [RESULT] line (it crashed, could not start,
+ * or died while holding them in its debounce window) through the spawn-per-event fallback
+ * @param {Map} unacknowledged - Event id -> event, emptied here so the events are replayed only once
+ * @param {string} reason - Why the process went away, for the log
+ */
+const replayUnacknowledged = (unacknowledged, reason) => {
+    if (unacknowledged.size === 0) {
+        return;
+    }
+    const events = [...unacknowledged.values()];
+    unacknowledged.clear();
+    Log.warn(`Python emailer ${reason}; re-running ${events.length} unacknowledged event(s) once each`, "System");
+    events.forEach((event) => {
+        try {
+            runPythonEmailerOnce(event.function, event.args);
+        } catch (err) {
+            Log.warn(`Dropped Python emailer event ${event.id} (${event.function}): ${err.message}`, "System");
+        }
+    });
+};
+
+/**
+ * Get (or start) the resident emailer process, which keeps its DB and SMTP connections warm
+ */
+const getEmailerProcess = () => {
+    if (emailerProcess) {
+        return emailerProcess;
+    }
+    const child = spawn("python3", [POS_EMAILER_PATH, "--quiet", "--serve"], { stdio: ["pipe", "pipe", "pipe"] });
+    child.unacknowledged = new Map();
+    watchEmailerOutput(child);
+    const reset = () => {
+        if (emailerProcess === child) {
+            emailerProcess = null;
+        }
+    };
+    // spawn ENOENT and stdin EPIPE arrive asynchronously, never as exceptions from write(); unacknowledged
+    // events are replayed on "close" (after the last [RESULT] line was read) or when the process never started
+    child.on("error", (err) => {
+        Log.warn(`Resident Python emailer error: ${err.message}`, "System");
+        reset();
+        if (child.pid === undefined) {
+            replayUnacknowledged(child.unacknowledged, `failed to start (${err.message})`);
+        }
+    });
+    child.on("exit", (code) => {
+        Log.warn(`Resident Python emailer exited with code ${code}`, "System");
+        reset();
+    });
+    child.on("close", (code) => {
+        replayUnacknowledged(child.unacknowledged, `exited with code ${code}`);
+    });
+    child.stdin.on("error", reset);
+
+    emailerProcess = child;
+    return child;
+};
+
+// Emailer log lines at these levels are forwarded with Log.info; anything else (warnings, errors, tracebacks) with Log.warn
+const EMAILER_INFO_LINE = /^\S+ \S+ (DEBUG|INFO)\s|"level": "(DEBUG|INFO)"/;
+
+/**
+ * Log failed events, emailer log output and stderr from an emailer process running in --serve mode,
+ * and clear acknowledged events from child.unacknowledged
+ * @param {ChildProcess} child - Spawned emailer process
+ */
+const watchEmailerOutput = (child) => {
+    readline.createInterface({ input: child.stdout }).on("line", (line) => {
+        if (!line.startsWith("[RESULT] ")) {
+            // The emailer logs to stdout; with --quiet that is only warnings, errors and their tracebacks
+            if (line.trim()) {
+                if (EMAILER_INFO_LINE.test(line)) {
+                    Log.info(`Python emailer: ${line}`, "System");
+                } else {
+                    Log.warn(`Python emailer: ${line}`, "System");
+                }
+            }
+            return;
+        }
+        try {
+            const result = JSON.parse(line.slice("[RESULT] ".length));
+            child.unacknowledged.delete(result.id);
+            if (!result.ok) {
+                Log.warn(`Python emailer event ${result.id} (${result.function}) failed`, "System");
+            }
+        } catch (err) {
+            Log.warn(`Unreadable Python emailer result: ${line}`, "System");
+        }
+    });
+    readline.createInterface({ input: child.stderr }).on("line", (line) => {
+        Log.warn(`Python emailer stderr: ${line}`, "System");
+    });
+};
+
+let pendingEvents = [];
+let batchTimer = null;
+
+/**
+ * Hand every event collected in the current window to one short-lived emailer process
+ */
+const flushEmailerBatch = () => {
+    const events = pendingEvents;
+    pendingEvents = [];
+    batchTimer = null;
+    if (events.length === 0) {
+        return;
+    }
+    try {
+        const child = spawn("python3", [POS_EMAILER_PATH, "--quiet", "--serve"], { stdio: ["pipe", "pipe", "pipe"] });
+        child.unacknowledged = new Map(events.map((event) => [event.id, event]));
+        watchEmailerOutput(child);
+        child.on("error", (err) => {
+            Log.warn(`Python emailer batch error (${events.length} events): ${err.message}`, "System");
+            if (child.pid === undefined) {
+                replayUnacknowledged(child.unacknowledged, `batch failed to start (${err.message})`);
+            }
+        });
+        child.on("close", (code) => {
+            replayUnacknowledged(child.unacknowledged, `batch exited with code ${code}`);
+        });
+        child.stdin.on("error", (err) => {
+            Log.warn(`Failed to write Python emailer batch: ${err.message}`, "System");
+        });
+        // Closing stdin makes the emailer coalesce and send the whole batch, then exit
+        child.stdin.end(events.map((event) => JSON.stringify(event)).join("\n") + "\n");
+    } catch (err) {
+        Log.warn(`Failed to start Python emailer for batch, running events once: ${err.message}`, "System");
+        events.forEach((event) => runPythonEmailerOnce(event.function, event.args));
+    }
+};
+
 /**
  * Call Python emailer function
  * @param {string} functionName - Name of function in pos-emailer.py
@@ -23,22 +188,24 @@ const POS_STATUS = {
  */
 const callPythonEmailer = (functionName, args) => {
     try {
-        // Run Python script asynchronously in background
-        // Don't wait for result - email failures shouldn't block the main process
-        const pythonArgs = [POS_EMAILER_PATH, "--function", functionName, "--args", JSON.stringify(args)];
-        
-        execFile("python3", pythonArgs, { timeout: 10000 }, (error, stdout, stderr) => {
-            if (error) {
-                Log.warn(`Python emailer error for ${functionName}: ${error.message}`, "System");
-            } else if (stderr) {
-                Log.warn(`Python emailer stderr for ${functionName}: ${stderr}`, "System");
+        const event = { id: nextEventID++, function: functionName, args };
+        if (!POS_EMAILER_RESIDENT) {
+            pendingEvents.push(event);
+            if (!batchTimer) {
+                batchTimer = setTimeout(flushEmailerBatch, POS_EMAILER_BATCH_MS);
             }
-            if (stdout) {
-                Log.info(`Python emailer output: ${stdout}`, "System");
-            }
-        });
+            return;
+        }
+        const child = getEmailerProcess();
+        child.stdin.write(JSON.stringify(event) + "\n");
+        child.unacknowledged.set(event.id, event);
     } catch (err) {
-        Log.warn(`Failed to invoke Python emailer: ${err.message}`, "System");
+        Log.warn(`Failed to send event to resident Python emailer, running once: ${err.message}`, "System");
+        try {
+            runPythonEmailerOnce(functionName, args);
+        } catch (innerErr) {
+            Log.warn(`Failed to invoke Python emailer: ${innerErr.message}`, "System");
+        }
     }
 };
 
@@ -234,11 +401,13 @@ module.exports.onPOSFeedback = (
 
         if (isRevisionRequest) {
             // Send revision request email
+            // Trailing true marks this as feedback: the emailer always sends it and keeps it out of its ledger
             callPythonEmailer("pos_requires_revision_email", [
                 studentID,
                 planOfStudyID,
                 feedback,
-                advisorPID
+                advisorPID,
+                true
             ]);
         } else {
             // Send generic feedback notification